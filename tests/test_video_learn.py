@@ -0,0 +1,75 @@
+"""
+Tests for VideoAnalyzer's handling of rejected Files API uploads.
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'utility'))
+
+try:
+    import anthropic
+    import httpx
+    import video_learn
+except ImportError as e:
+    raise unittest.SkipTest(f"video_learn dependencies not installed: {e}")
+
+
+def _api_error(error_class, status_code: int, error_type: str, message: str):
+    """Build an SDK error the way the client raises it for an API error response."""
+    response = httpx.Response(status_code, request=httpx.Request('POST', 'https://api.anthropic.com/v1/messages'))
+    body = {'type': 'error', 'error': {'type': error_type, 'message': message}}
+    return error_class(f"Error code: {status_code}", response=response, body=body)
+
+
+class RejectedUploadTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.analyzer = video_learn.VideoAnalyzer(self._tmp.name, use_files_api=True)
+        self.analyzer._cache_dir.mkdir()
+        self.cache_entry = self.analyzer._cache_dir / 'frame-file'
+        self.cache_entry.write_bytes(b'{"file_id": "file_abc123", "uploaded_at": 0}')
+        self.request = {'messages': [{'role': 'user', 'content': [
+            {'type': 'image', 'source': {'type': 'file', 'file_id': 'file_abc123'}},
+            {'type': 'text', 'text': 'Please analyze this YouTube video'},
+        ]}]}
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_unrelated_bad_request_keeps_cache(self):
+        error = _api_error(anthropic.BadRequestError, 400, 'invalid_request_error',
+                           'prompt is too long: the text file exceeds the maximum context length')
+        self.assertFalse(self.analyzer._rejected_upload(error, self.request))
+        self.assertTrue(self.cache_entry.exists())
+
+    def test_bad_request_naming_file_id_drops_cache(self):
+        error = _api_error(anthropic.BadRequestError, 400, 'invalid_request_error',
+                           'File not found: file_abc123')
+        self.assertTrue(self.analyzer._rejected_upload(error, self.request))
+        self.assertFalse(self.cache_entry.exists())
+
+    def test_file_not_found_drops_cache(self):
+        error = _api_error(anthropic.NotFoundError, 404, 'not_found_error', 'File not found.')
+        self.assertTrue(self.analyzer._rejected_upload(error, self.request))
+        self.assertFalse(self.cache_entry.exists())
+
+    def test_model_not_found_keeps_cache(self):
+        error = _api_error(anthropic.NotFoundError, 404, 'not_found_error', 'model: claude-unknown')
+        self.assertFalse(self.analyzer._rejected_upload(error, self.request))
+        self.assertTrue(self.cache_entry.exists())
+
+    def test_ignored_without_files_api(self):
+        self.analyzer.use_files_api = False
+        error = _api_error(anthropic.BadRequestError, 400, 'invalid_request_error',
+                           'File not found: file_abc123')
+        self.assertFalse(self.analyzer._rejected_upload(error, self.request))
+        self.assertTrue(self.cache_entry.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
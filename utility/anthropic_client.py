@@ -0,0 +1,44 @@
+"""
+Anthropic clients shared by the utility scripts.
+
+Every script gets its clients from here, so connection settings live in one
+place: HTTP/2 when the h2 package is installed, and a pool of keep-alive
+connections so repeated requests skip the TCP/TLS handshake.
+"""
+from typing import Optional
+
+import httpx
+from anthropic import Anthropic, AsyncAnthropic, DefaultAsyncHttpxClient, DefaultHttpxClient
+
+try:
+    # HTTP/2 lets concurrent requests share one connection; httpx only
+    # supports it when the h2 package is installed
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=16)
+
+_client: Optional[Anthropic] = None
+
+def get_client() -> Anthropic:
+    """Return the shared sync client, creating it on first use.
+
+    Reusing one client keeps its connection pool warm across calls.
+    """
+    global _client
+    if _client is None:
+        _client = Anthropic(http_client=DefaultHttpxClient(http2=HTTP2, limits=HTTP_LIMITS))
+    return _client
+
+def async_client(api_key: Optional[str] = None) -> AsyncAnthropic:
+    """Create an async client with the shared connection settings.
+
+    Async clients are tied to the event loop they first run on, so each
+    asyncio.run creates its own and closes it with `async with`.
+    """
+    return AsyncAnthropic(
+        api_key=api_key,
+        http_client=DefaultAsyncHttpxClient(http2=HTTP2, limits=HTTP_LIMITS)
+    )
@@ -0,0 +1,38 @@
+"""
+JSON helpers shared by the video and comment utilities.
+
+orjson parses and serializes large comment, metadata and cache files much
+faster than the stdlib module; when it is not installed the stdlib json
+module is used with the same function signatures.
+"""
+import json
+
+try:
+    import orjson
+
+    def json_loads(data):
+        return orjson.loads(data)
+
+    def json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def json_dumps_indented(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+
+    def json_dumps_line(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+except ImportError:
+    def json_loads(data):
+        # The stdlib parser does not accept memoryviews
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    def json_dumps_indented(obj) -> str:
+        return json.dumps(obj, indent=2)
+
+    def json_dumps_line(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8') + b'\n'
@@ -41,7 +41,6 @@ Notes:
     - Output directory is created automatically if it doesn't exist
 """
 
-import cv2
 import os
 from pathlib import Path
 from datetime import datetime
@@ -86,6 +85,9 @@ def video_frame_split(video_path: str, output_dir: str = None, time_interval: fl
     print(f'Opening video file: {video_path}')
     print(f'Frames will be saved to: {output_path}')
     
+    # Imported here so importing this module doesn't pay OpenCV's load cost
+    import cv2
+
     # Open video file
     video = cv2.VideoCapture(str(video_path))
     
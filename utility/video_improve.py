@@ -10,14 +10,14 @@ python video_improve.py --baseline "/Users/yuanlu/Code/youtube_copilot/demo/vide
 """
 
 import argparse
-import json
 import os
+import re
 import base64
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import ClassVar, Dict, List, Optional, Tuple
 import logging
 from datetime import datetime
-from anthropic import Anthropic
+from json_utils import json_dumps_indented, json_loads
 
 # Configure logging
 logging.basicConfig(
@@ -26,12 +26,99 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Subtitle lines to drop: cue numbers, cue timings, the WEBVTT header and blank lines
+_SUBTITLE_SKIP = re.compile(r'^(?:\s*\d+\s*|.*-->.*|\s*WEBVTT.*|\s*)$')
+
 class VideoImprover:
     """Compares new video against baseline advice to generate improvement suggestions."""
     
     SUPPORTED_IMAGE_FORMATS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
     SUPPORTED_TEXT_FORMATS = {'.txt', '.json', '.vtt', '.md', '.srt'}
-    
+    _MEDIA_TYPES: ClassVar[Dict[str, str]] = {
+        '.jpg': 'image/jpeg',
+        '.jpeg': 'image/jpeg',
+        '.png': 'image/png',
+        '.gif': 'image/gif',
+        '.webp': 'image/webp'
+    }
+
+    # Placeholders are filled with str.format_map, so literal braces must be doubled
+    _PROMPT_TEMPLATE = (
+        "You are a video content optimization expert tasked with analyzing a new video "
+        "and providing specific improvement suggestions based on successful strategies "
+        "from a baseline popular video. Your analysis should be thorough, insightful, "
+        "and actionable.\n\n"
+
+        "First, review the baseline successful video analysis:\n\n"
+
+        "<baseline_analysis>\n"
+        "{baseline_analysis}\n"
+        "</baseline_analysis>\n\n"
+
+        "Now, examine the information about the new video:\n\n"
+
+        "<new_video>\n"
+        "{new_video_info}\n"
+        "</new_video>\n\n"
+
+        "Your task is to compare the new video against the baseline success factors "
+        "and provide detailed improvement suggestions. Structure your analysis as follows:\n\n"
+
+        "<analysis_structure>\n"
+        "# Video Improvement Analysis\n\n"
+
+        "## Comments from Viewers Analysis\n\n"
+
+        "## Priority Improvements\n"
+        "[For each improvement area:]\n"
+        "1. [Improvement Area Name]\n"
+        " - Current Approach: [what the new video does]\n"
+        " - Successful Strategy: [what the baseline video does]\n"
+        " - Specific Suggestions: [3 actionable steps to improve]\n"
+        " - Expected Impact: [why this improvement matters]\n\n"
+
+        "## Title Improvement Advice\n"
+        "[Provide 3 topic and title ideas to improve the current video title]\n"
+        "</analysis_structure>\n\n"
+
+        "For the \"Comments from Viewers Analysis\" section:\n"
+        "- Analyze the sentiment and content of viewer comments for both videos\n"
+        "- Identify key differences in audience reception\n"
+        "- Highlight areas where the new video could improve based on viewer feedback\n\n"
+
+        "For the \"Priority Improvements\" section:\n"
+        "- Identify 3 key areas where the new video can improve\n"
+        "- For each area, clearly state the current approach in the new video and the "
+        "successful strategy from the baseline video\n"
+        "- Provide 3 specific, actionable suggestions for improvement\n"
+        "- Explain the expected impact of each improvement\n\n"
+
+        "For the \"Title Improvement Advice\" section:\n"
+        "- Provide 3 topic and title ideas to improve the current video title\n"
+        "- Focus on key elements of how the benchmark appealed to its audience\n"
+        "- For each idea, include a brief explanation based on the criteria of "
+        "authenticity, relatability, and engagement\n"
+        "- Emphasize the differences between the profiles and what the audience "
+        "responded to in the benchmark profile\n\n"
+
+        "Ensure your suggestions are:\n"
+        "- Specific and actionable\n"
+        "- Based on evidence from both videos\n"
+        "- Prioritized by potential impact\n"
+        "- Realistic to implement\n\n"
+
+        "Format your response as a markdown document with clear sections and bullet points. "
+        "Use the exact headings and structure provided in the analysis_structure.\n\n"
+
+        "Remember to:\n"
+        "- Provide detailed, evidence-based analysis\n"
+        "- Focus on actionable improvements\n"
+        "- Prioritize suggestions based on potential impact\n"
+        "- Maintain a professional and constructive tone throughout\n\n"
+
+        "Begin your analysis now, following the structure and guidelines provided."
+    )
+
     def __init__(self, baseline_path: str, new_video_path: str):
         """
         Initialize the VideoImprover.
@@ -51,15 +138,7 @@ class VideoImprover:
                 base64_image = base64.b64encode(image_file.read()).decode('utf-8')
                 logger.info(f"Successfully encoded image: {image_path.name}")
                 
-                media_type_mapping = {
-                    '.jpg': 'image/jpeg',
-                    '.jpeg': 'image/jpeg',
-                    '.png': 'image/png',
-                    '.gif': 'image/gif',
-                    '.webp': 'image/webp'
-                }
-                
-                media_type = media_type_mapping.get(image_path.suffix.lower(), 'image/jpeg')
+                media_type = self._MEDIA_TYPES.get(image_path.suffix.lower(), 'image/jpeg')
                 
                 return {
                     'type': 'image',
@@ -78,25 +157,23 @@ class VideoImprover:
         suffix = file_path.suffix.lower()
         try:
             if suffix == '.json':
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = json.load(f)
+                with open(file_path, 'rb') as f:
+                    content = json_loads(f.read())
                     # Handle both single objects and arrays
                     if isinstance(content, list):
-                        formatted_content = '\n'.join(json.dumps(item, indent=2) for item in content)
+                        formatted_content = '\n'.join(json_dumps_indented(item) for item in content)
                     else:
-                        formatted_content = json.dumps(content, indent=2)
+                        formatted_content = json_dumps_indented(content)
                     return f"\n=== {file_path.name} ===\n{formatted_content}\n"
             
             elif suffix in {'.vtt', '.srt'}:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     content = f.read()
                     # Clean up subtitle formatting
-                    lines = [line for line in content.split('\n') 
-                            if not line.strip().isdigit() and 
-                            not '-->' in line and 
-                            not line.strip().startswith('WEBVTT') and
-                            line.strip()]
-                    return f"\n=== Transcript from {file_path.name} ===\n{''.join(lines)}\n"
+                    transcript = '\n'.join(
+                        line for line in content.splitlines() if not _SUBTITLE_SKIP.match(line)
+                    )
+                    return f"\n=== Transcript from {file_path.name} ===\n{transcript}\n"
             
             elif suffix in {'.txt', '.md'}:
                 with open(file_path, 'r', encoding='utf-8') as f:
@@ -108,7 +185,7 @@ class VideoImprover:
                             if ':' in line:
                                 key, value = line.split(':', 1)
                                 metadata[key.strip()] = value.strip()
-                        return f"\n=== Metadata from {file_path.name} ===\n{json.dumps(metadata, indent=2)}\n"
+                        return f"\n=== Metadata from {file_path.name} ===\n{json_dumps_indented(metadata)}\n"
                     return f"\n=== Content from {file_path.name} ===\n{content}\n"
                 
         except Exception as e:
@@ -160,82 +237,8 @@ class VideoImprover:
         return image_contents, '\n'.join(new_video_text), baseline_analysis
 
     def generate_prompt(self) -> str:
-        """Generate a comprehensive prompt for improvement analysis."""
-        return (
-            "You are a video content optimization expert tasked with analyzing a new video "
-            "and providing specific improvement suggestions based on successful strategies "
-            "from a baseline popular video. Your analysis should be thorough, insightful, "
-            "and actionable.\n\n"
-
-            "First, review the baseline successful video analysis:\n\n"
-
-            "<baseline_analysis>\n"
-            "{{BASELINE_ANALYSIS}}\n"
-            "</baseline_analysis>\n\n"
-
-            "Now, examine the information about the new video:\n\n"
-
-            "<new_video>\n"
-            "{{NEW_VIDEO_INFO}}\n"
-            "</new_video>\n\n"
-
-            "Your task is to compare the new video against the baseline success factors "
-            "and provide detailed improvement suggestions. Structure your analysis as follows:\n\n"
-
-            "<analysis_structure>\n"
-            "# Video Improvement Analysis\n\n"
-
-            "## Comments from Viewers Analysis\n\n"
-
-            "## Priority Improvements\n"
-            "[For each improvement area:]\n"
-            "1. [Improvement Area Name]\n"
-            " - Current Approach: [what the new video does]\n"
-            " - Successful Strategy: [what the baseline video does]\n"
-            " - Specific Suggestions: [3 actionable steps to improve]\n"
-            " - Expected Impact: [why this improvement matters]\n\n"
-
-            "## Title Improvement Advice\n"
-            "[Provide 3 topic and title ideas to improve the current video title]\n"
-            "</analysis_structure>\n\n"
-
-            "For the \"Comments from Viewers Analysis\" section:\n"
-            "- Analyze the sentiment and content of viewer comments for both videos\n"
-            "- Identify key differences in audience reception\n"
-            "- Highlight areas where the new video could improve based on viewer feedback\n\n"
-
-            "For the \"Priority Improvements\" section:\n"
-            "- Identify 3 key areas where the new video can improve\n"
-            "- For each area, clearly state the current approach in the new video and the "
-            "successful strategy from the baseline video\n"
-            "- Provide 3 specific, actionable suggestions for improvement\n"
-            "- Explain the expected impact of each improvement\n\n"
-
-            "For the \"Title Improvement Advice\" section:\n"
-            "- Provide 3 topic and title ideas to improve the current video title\n"
-            "- Focus on key elements of how the benchmark appealed to its audience\n"
-            "- For each idea, include a brief explanation based on the criteria of "
-            "authenticity, relatability, and engagement\n"
-            "- Emphasize the differences between the profiles and what the audience "
-            "responded to in the benchmark profile\n\n"
-
-            "Ensure your suggestions are:\n"
-            "- Specific and actionable\n"
-            "- Based on evidence from both videos\n"
-            "- Prioritized by potential impact\n"
-            "- Realistic to implement\n\n"
-
-            "Format your response as a markdown document with clear sections and bullet points. "
-            "Use the exact headings and structure provided in the analysis_structure.\n\n"
-
-            "Remember to:\n"
-            "- Provide detailed, evidence-based analysis\n"
-            "- Focus on actionable improvements\n"
-            "- Prioritize suggestions based on potential impact\n"
-            "- Maintain a professional and constructive tone throughout\n\n"
-
-            "Begin your analysis now, following the structure and guidelines provided."
-        )
+        """Return the prompt template with {baseline_analysis} and {new_video_info} placeholders."""
+        return self._PROMPT_TEMPLATE
 
     def generate_improvements(self, output_path: Optional[str] = None) -> str:
         """Generate improvement suggestions and save as markdown file.
@@ -261,20 +264,19 @@ class VideoImprover:
         # Prepare message content
         message_content = image_contents + [{
             'type': 'text',
-            'text': self.generate_prompt().replace(
-                '{{BASELINE_ANALYSIS}}', baseline_analysis
-            ).replace(
-                '{{NEW_VIDEO_INFO}}', new_video_text
-            )
+            'text': self.generate_prompt().format_map({
+                'baseline_analysis': baseline_analysis,
+                'new_video_info': new_video_text
+            })
         }]
         
         try:
-            # Initialize Anthropic client
-            client = Anthropic()
-            
+            # Imported lazily so VideoImprover can be used without loading the SDK
+            from anthropic_client import get_client
+
             # Create message using Claude API
             logger.info("Sending request to Claude API...")
-            response = client.messages.create(
+            response = get_client().messages.create(
                 model="claude-3-5-sonnet-20241022",
                 max_tokens=5000,
                 temperature=0.3,
@@ -7,17 +7,46 @@ to generate insights about video popularity on YouTube.
 
 python video_learn.py "/Users/yuanlu/Code/youtube_copilot/data/frames_output_Two_GPT-4os_interacting_and_singing"
 python video_learn.py "/Users/yuanlu/Code/youtube_copilot/data/frames_output_Claude_Computer_use_for_coding"
+
+# Analyze several folders concurrently
+python video_learn.py "/path/to/frames_a" "/path/to/frames_b" --max-concurrent 4
 """
 
 import argparse
-import json
+import asyncio
+import hashlib
+import io
+import mmap
 import os
-import base64
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import logging
 from datetime import datetime
-from anthropic import Anthropic
+from anthropic import APIStatusError, AsyncAnthropic, BadRequestError, NotFoundError
+from anthropic_client import async_client, get_client
+from json_utils import json_dumps, json_dumps_indented, json_loads
+
+try:
+    # SIMD-accelerated encoder with the same API as the stdlib module, plus
+    # b64encode_as_string which skips the intermediate bytes object
+    import pybase64 as base64
+    _b64encode_as_string = base64.b64encode_as_string
+except ImportError:
+    import base64
+
+    def _b64encode_as_string(data) -> str:
+        return base64.b64encode(data).decode('ascii')
+
+try:
+    # Optional: downscale and re-encode frames before base64 to shrink the payload
+    from PIL import Image
+except ImportError:
+    Image = None
 
 # Configure logging
 logging.basicConfig(
@@ -26,185 +55,521 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Map file extensions to proper media types
+_MEDIA_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp'
+}
+
+# VTT lines to drop: cue numbers, cue timings and blank lines
+_VTT_STRIP_PATTERN = r'^(?:[ \t]*\d+[ \t]*|.*-->.*|[ \t]*)\r?(?:\n|\Z)'
+_VTT_STRIP = re.compile(_VTT_STRIP_PATTERN, re.M)
+_VTT_STRIP_BYTES = re.compile(_VTT_STRIP_PATTERN.encode(), re.M)
+
+# "key: value" lines in metadata text files
+_META_LINE_PATTERN = r'^[ \t]*([^:\r\n]*?)[ \t]*:[ \t]*(.*?)[ \t]*\r?$'
+_META_LINE = re.compile(_META_LINE_PATTERN, re.M)
+_META_LINE_BYTES = re.compile(_META_LINE_PATTERN.encode(), re.M)
+
+# Text files larger than this are memory-mapped and scanned as bytes instead
+# of being read into a str first
+_MMAP_THRESHOLD = 256 * 1024
+
+# Claude downsamples images beyond this on the long edge, so larger frames only
+# add payload; frames are re-encoded as JPEG at this quality
+_PREP_MAX_DIM = 1568
+_PREP_JPEG_QUALITY = 75
+
+# Uploaded files live until they are deleted; cached file_ids older than this
+# are uploaded again rather than trusted indefinitely
+_FILE_ID_TTL = 7 * 24 * 3600
+
+# Per-thread read buffer reused across frames, grown to the largest frame seen
+_read_buffers = threading.local()
+
+def _iter_files(root) -> Iterator[os.DirEntry]:
+    """
+    Recursively yield file entries under root.
+
+    Uses os.scandir, whose entries carry the file type from the directory
+    listing, so no extra stat call is needed per file.
+    """
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_files(entry.path)
+            elif entry.is_file():
+                yield entry
+
+def _cache_key(image_path: Path) -> str:
+    """
+    Build the frame cache key from the image path, modification time and size.
+
+    Keys have no file extension, so cache entries are never picked up as input files.
+    """
+    stat = image_path.stat()
+    return hashlib.blake2b(
+        f"{image_path}|{stat.st_mtime_ns}|{stat.st_size}".encode(), digest_size=16
+    ).hexdigest()
+
+def _downscale_frame(image_path: Path, size: int) -> Optional[io.BytesIO]:
+    """
+    Downscale a frame to _PREP_MAX_DIM and re-encode it as JPEG.
+
+    Returns None if Pillow cannot decode the frame or the result would not be
+    smaller than the original file; the frame is then sent unchanged.
+    """
+    try:
+        with Image.open(image_path) as im:
+            im.thumbnail((_PREP_MAX_DIM, _PREP_MAX_DIM), Image.BILINEAR)
+            if im.mode != 'RGB':
+                im = im.convert('RGB')
+            out = io.BytesIO()
+            im.save(out, 'JPEG', quality=_PREP_JPEG_QUALITY)
+    except OSError as e:
+        logger.debug("Sending %s without downscaling: %s", image_path.name, e)
+        return None
+    return out if out.tell() < size else None
+
+def _encode_image_worker(path_str: str, suffix: str, cache_dir: Optional[str] = None) -> Optional[Dict]:
+    """
+    Encode an image file to base64.
+
+    suffix is the lowercased file extension, already computed by the caller.
+    When Pillow is installed, frames are downscaled and re-encoded as JPEG first.
+    If cache_dir is given, encoded images are cached there keyed by path,
+    modification time and size, so unchanged frames are not re-encoded.
+    Returns None if the image could not be encoded.
+    """
+    image_path = Path(path_str)
+    try:
+        cache_path = None
+        if cache_dir:
+            cache_path = Path(cache_dir) / _cache_key(image_path)
+            if Image is not None:
+                cache_path = cache_path.with_name(
+                    f"{cache_path.name}-{_PREP_MAX_DIM}q{_PREP_JPEG_QUALITY}")
+            try:
+                with open(cache_path, 'rb') as f:
+                    return json_loads(f.read())
+            except (OSError, ValueError):
+                pass
+
+        size = image_path.stat().st_size
+        media_type = _MEDIA_TYPES.get(suffix, 'image/jpeg')
+        frame = _downscale_frame(image_path, size) if Image is not None else None
+        if frame is not None:
+            base64_image = _b64encode_as_string(frame.getbuffer())
+            media_type = 'image/jpeg'
+        else:
+            # Read the whole file in one call into this thread's reusable buffer,
+            # then encode straight to a str
+            buf = getattr(_read_buffers, 'buf', None)
+            if buf is None or len(buf) < size:
+                buf = _read_buffers.buf = bytearray(size)
+            with open(image_path, 'rb', buffering=0) as image_file:
+                size = image_file.readinto(memoryview(buf)[:size])
+            base64_image = _b64encode_as_string(memoryview(buf)[:size])
+        logger.debug("Successfully encoded image: %s", image_path.name)
+        
+        content = {
+            'type': 'image',
+            'source': {
+                'type': 'base64',
+                'media_type': media_type,
+                'data': base64_image
+            }
+        }
+
+        if cache_path:
+            try:
+                with open(cache_path, 'wb') as f:
+                    f.write(json_dumps(content))
+            except OSError as e:
+                logger.warning("Failed to cache encoded image %s: %s", image_path.name, e)
+
+        return content
+    except Exception as e:
+        logger.error("Failed to process image %s: %s", image_path, e)
+        return None
+
+def _upload_image(client, path_str: str, suffix: str, cache_dir: Optional[str] = None) -> Optional[Dict]:
+    """
+    Upload an image file through the Anthropic Files API and reference it by file_id.
+
+    This avoids base64 encoding entirely. If cache_dir is given, the returned
+    file_id is cached with its upload time so unchanged frames are not uploaded
+    again until the entry is older than _FILE_ID_TTL.
+    Returns None if the image could not be uploaded.
+    """
+    image_path = Path(path_str)
+    try:
+        cache_path = None
+        file_id = None
+        if cache_dir:
+            cache_path = Path(cache_dir) / f"{_cache_key(image_path)}-file"
+            try:
+                with open(cache_path, 'rb') as f:
+                    cached = json_loads(f.read())
+                if time.time() - cached['uploaded_at'] < _FILE_ID_TTL:
+                    file_id = cached['file_id']
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+
+        if file_id is None:
+            media_type = _MEDIA_TYPES.get(suffix, 'image/jpeg')
+            with open(image_path, 'rb') as image_file:
+                file_obj = client.beta.files.upload(file=(image_path.name, image_file, media_type))
+            logger.debug("Successfully uploaded image: %s", image_path.name)
+            file_id = file_obj.id
+
+            if cache_path:
+                try:
+                    with open(cache_path, 'wb') as f:
+                        f.write(json_dumps({'file_id': file_id, 'uploaded_at': time.time()}))
+                except OSError as e:
+                    logger.warning("Failed to cache file id for %s: %s", image_path.name, e)
+
+        return {
+            'type': 'image',
+            'source': {
+                'type': 'file',
+                'file_id': file_id
+            }
+        }
+    except Exception as e:
+        logger.error("Failed to upload image %s: %s", image_path, e)
+        return None
+
 class VideoAnalyzer:
     """Analyzes video-related files to generate insights about video popularity."""
     
     SUPPORTED_IMAGE_FORMATS = {'.jpg', '.jpeg', '.png'}
     SUPPORTED_TEXT_FORMATS = {'.txt', '.json', '.vtt', '.md'}
-    
-    def __init__(self, folder_path: str):
+    DEFAULT_MAX_FRAMES = 24
+    # Analyses are written next to their inputs; they are outputs, not inputs
+    OUTPUT_PREFIX = 'video_analysis_'
+
+    _ANALYSIS_PROMPT = (
+        "You are a video content strategist specializing in analyzing viral and successful content. "
+        "Your task is to analyze the provided video information and extract 10 specific, actionable "
+        "strategies that contributed to its success.\n\n"
+        
+        "Here are the video components you will analyze:\n\n"
+        
+        "[VIDEO TRANSCRIPT]\n"
+        "<video_transcript>\n"
+        "{{VIDEO_TRANSCRIPT}}\n"
+        "</video_transcript>\n\n"
+        
+        "[VIDEO METADATA]\n"
+        "<video_metadata>\n"
+        "{{VIDEO_METADATA}}\n"
+        "</video_metadata>\n\n"
+        
+        "[VIDEO SCREENSHOTS]\n"
+        "<video_screenshots>\n"
+        "{{VIDEO_SCREENSHOTS}}\n"
+        "</video_screenshots>\n\n"
+        
+        "Carefully review all the provided information. Your goal is to identify 10 key success "
+        "factors that contributed to the video's effectiveness. For each success factor, you will "
+        "provide a detailed analysis following this structure:\n\n"
+        
+        "## Success Factor #[number]: [Strategy Name]\n"
+        "- What They Did: [specific technique used]\n"
+        "- Why It Works: [psychological or strategic explanation]\n"
+        "- Example From Video: [concrete example]\n"
+        "- How To Apply: [actionable implementation tip]\n\n"
+        
+        "Consider these aspects in your analysis:\n"
+        "- Hook and opening sequence\n"
+        "- Narrative structure\n"
+        "- Audience engagement techniques\n"
+        "- Visual presentation\n"
+        "- Content pacing\n"
+        "- Emotional triggers\n"
+        "- Call-to-action effectiveness\n"
+        "- Title and thumbnail strategy\n"
+        "- Audio/voice techniques\n"
+        "- Unique differentiators\n\n"
+        
+        "Your insights should be:\n"
+        "- Specific and actionable (not generic advice)\n"
+        "- Supported by evidence from the video\n"
+        "- Applicable to other content creators\n"
+        "- Focused on replicable techniques\n\n"
+        
+        "After identifying and analyzing the 10 success factors, conclude with a brief summary "
+        "of the most essential success factor that other creators should prioritize implementing first.\n\n"
+        
+        "Format your entire response as follows:\n\n"
+        
+        "<analysis>\n"
+        "# Top 10 Success Factors Analysis\n\n"
+        
+        "[Insert your 10 success factors here, formatted as specified above]\n\n"
+        
+        "# Conclusion\n\n"
+        
+        "[Insert your brief conclusion here, highlighting the most essential success factor]\n"
+        "</analysis>\n\n"
+        
+        "Remember to base all your insights on the provided video transcript, metadata, and "
+        "screenshot descriptions. Do not make assumptions about content that isn't explicitly "
+        "mentioned in the provided information."
+    )
+
+    def __init__(self, folder_path: str, max_frames: Optional[int] = DEFAULT_MAX_FRAMES,
+                 use_files_api: bool = False):
         """
         Initialize the VideoAnalyzer.
 
         Args:
             folder_path: Path to the folder containing video-related files
+            max_frames: Maximum number of evenly spaced frames to send (None for all)
+            use_files_api: Upload frames via the Files API instead of inlining them as base64
         """
+        if max_frames is not None and max_frames < 0:
+            raise ValueError(f"max_frames must be 0 or more, got {max_frames}")
         self.folder_path = Path(folder_path)
+        self.max_frames = max_frames
+        self.use_files_api = use_files_api
+        self._cache_dir = self.folder_path / '.b64cache'
         self.metadata: Dict = {}
         self.comments: List[Dict] = []
         self.subtitles: str = ''
         self.frame_paths: List[str] = []
         
-    def _encode_image(self, image_path: Path) -> Dict:
-        """Encode an image file to base64."""
-        try:
-            with open(image_path, 'rb') as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-                logger.info(f"Successfully encoded image: {image_path.name}")
-                
-                # Map file extensions to proper media types
-                media_type_mapping = {
-                    '.jpg': 'image/jpeg',
-                    '.jpeg': 'image/jpeg',
-                    '.png': 'image/png',
-                    '.gif': 'image/gif',
-                    '.webp': 'image/webp'
-                }
-                
-                media_type = media_type_mapping.get(image_path.suffix.lower(), 'image/jpeg')
-                
-                return {
-                    'type': 'image',
-                    'source': {
-                        'type': 'base64',
-                        'media_type': media_type,
-                        'data': base64_image
-                    }
-                }
-        except Exception as e:
-            logger.error(f"Error encoding image {image_path}: {str(e)}")
-            raise
-
     def _parse_text_file(self, file_path: Path) -> str:
         """Parse different types of text files appropriately."""
-        suffix = file_path.suffix.lower()
+        # Lowercase the name once; both the suffix and the metadata check use it
+        name_lower = file_path.name.lower()
+        suffix = os.path.splitext(name_lower)[1]
         try:
             if suffix == '.json':
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = json.load(f)
-                    return f"\n=== {file_path.name} ===\n{json.dumps(content, indent=2)}\n"
+                with open(file_path, 'rb') as f:
+                    content = json_loads(f.read())
+                    return f"\n=== {file_path.name} ===\n{json_dumps_indented(content)}\n"
             
             elif suffix == '.vtt':
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    # Clean up VTT formatting
-                    lines = [line for line in content.split('\n') 
-                            if not line.strip().isdigit() and 
-                            not '-->' in line and 
-                            line.strip()]
-                    return f"\n=== Transcript from {file_path.name} ===\n{''.join(lines)}\n"
+                # Clean up VTT formatting
+                if file_path.stat().st_size > _MMAP_THRESHOLD:
+                    with open(file_path, 'rb') as f, \
+                            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        transcript = _VTT_STRIP_BYTES.sub(b'', mm).decode('utf-8')
+                else:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        transcript = _VTT_STRIP.sub('', f.read())
+                return f"\n=== Transcript from {file_path.name} ===\n{transcript}\n"
             
-            elif suffix == '.txt':
+            elif suffix in ('.txt', '.md'):
+                if suffix == '.txt' and 'metadata' in name_lower:
+                    # Parse metadata-style text files
+                    if file_path.stat().st_size > _MMAP_THRESHOLD:
+                        with open(file_path, 'rb') as f, \
+                                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                            metadata = {
+                                key.decode('utf-8'): value.decode('utf-8')
+                                for key, value in _META_LINE_BYTES.findall(mm)
+                            }
+                    else:
+                        with open(file_path, 'r', encoding='utf-8') as f:
+                            metadata = dict(_META_LINE.findall(f.read()))
+                    return f"\n=== Metadata from {file_path.name} ===\n{json_dumps_indented(metadata)}\n"
                 with open(file_path, 'r', encoding='utf-8') as f:
                     content = f.read()
-                    if 'metadata' in file_path.name.lower():
-                        # Parse metadata-style text files
-                        metadata = {}
-                        for line in content.split('\n'):
-                            if ':' in line:
-                                key, value = line.split(':', 1)
-                                metadata[key.strip()] = value.strip()
-                        return f"\n=== Metadata from {file_path.name} ===\n{json.dumps(metadata, indent=2)}\n"
                     return f"\n=== Content from {file_path.name} ===\n{content}\n"
                 
         except Exception as e:
-            logger.error(f"Error parsing {file_path}: {str(e)}")
+            logger.error("Error parsing %s: %s", file_path, e)
             return f"\n=== Error parsing {file_path.name} ===\n"
 
     def _process_files(self) -> Tuple[List[Dict], str]:
         """Process all supported files in the folder and subfolders."""
-        image_contents = []
-        text_contents = []
+        start_time = time.perf_counter()
+        image_paths = []
+        image_suffixes = []
+        text_paths = []
+        text_buf = io.StringIO()
 
-        # Process files recursively
-        for file_path in Path(self.folder_path).rglob('*'):
-            if file_path.is_file():
-                suffix = file_path.suffix.lower()
-                
-                if suffix in self.SUPPORTED_IMAGE_FORMATS:
-                    logger.info(f"Processing image: {file_path.name}")
-                    try:
-                        image_contents.append(self._encode_image(file_path))
-                    except Exception as e:
-                        logger.error(f"Failed to process image {file_path}: {str(e)}")
-                
-                elif suffix in self.SUPPORTED_TEXT_FORMATS:
-                    logger.info(f"Processing text file: {file_path.name}")
-                    text_contents.append(self._parse_text_file(file_path))
+        # Collect files recursively; images and text are processed below
+        for entry in sorted(_iter_files(self.folder_path), key=lambda e: e.path):
+            suffix = os.path.splitext(entry.name)[1].lower()
+            
+            if suffix in self.SUPPORTED_IMAGE_FORMATS:
+                image_paths.append(entry.path)
+                image_suffixes.append(suffix)
+            
+            elif suffix in self.SUPPORTED_TEXT_FORMATS and not entry.name.startswith(self.OUTPUT_PREFIX):
+                text_paths.append(Path(entry.path))
+
+        # Send a representative, evenly spaced subset of frames rather than all of them
+        if self.max_frames and len(image_paths) > self.max_frames:
+            n, k = len(image_paths), self.max_frames
+            indices = [i * n // k for i in range(k)]
+            image_paths = [image_paths[i] for i in indices]
+            image_suffixes = [image_suffixes[i] for i in indices]
+            logger.info("Sampled %d frames for analysis", len(image_paths))
+
+        # Encoding and uploads release the GIL during file reads, network I/O and
+        # pybase64's encoder, so threads overlap them without pickling results
+        # back from worker processes. Text files are parsed on the same pool.
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            if image_paths:
+                self._cache_dir.mkdir(exist_ok=True)
+                if self.use_files_api:
+                    worker = partial(_upload_image, get_client(), cache_dir=str(self._cache_dir))
+                else:
+                    worker = partial(_encode_image_worker, cache_dir=str(self._cache_dir))
+                images = executor.map(worker, image_paths, image_suffixes)
+            else:
+                images = iter(())
+            texts = executor.map(self._parse_text_file, text_paths)
 
-        return image_contents, '\n'.join(text_contents)
+            for text in texts:
+                text_buf.write(text)
+                text_buf.write('\n')
+            image_contents = self._dedup_images(content for content in images if content is not None)
+
+        logger.info("Prepared %d images, parsed %d text files in %.2fs",
+                    len(image_contents), len(text_paths), time.perf_counter() - start_time)
+        return image_contents, text_buf.getvalue()
+
+    @staticmethod
+    def _dedup_images(images: Iterable[Dict]) -> List[Dict]:
+        """
+        Drop frames whose encoded bytes are identical to an earlier frame.
+
+        Static scenes produce runs of identical frames; sending them again only
+        adds payload. The base64 strings are compared through a set, so each
+        one is hashed once in C. Files API references cannot be compared by
+        content and are kept as they are.
+        """
+        seen = set()
+        unique = []
+        duplicates = 0
+        for content in images:
+            data = content['source'].get('data')
+            if data is not None:
+                if data in seen:
+                    duplicates += 1
+                    continue
+                seen.add(data)
+            unique.append(content)
+        if duplicates:
+            logger.info("Skipped %d duplicate frames", duplicates)
+        return unique
 
     def generate_prompt(self) -> str:
-        """Generate a comprehensive prompt for analysis."""
-        return (
-            "You are a video content strategist specializing in analyzing viral and successful content. "
-            "Your task is to analyze the provided video information and extract 10 specific, actionable "
-            "strategies that contributed to its success.\n\n"
-            
-            "Here are the video components you will analyze:\n\n"
-            
-            "[VIDEO TRANSCRIPT]\n"
-            "<video_transcript>\n"
-            "{{VIDEO_TRANSCRIPT}}\n"
-            "</video_transcript>\n\n"
-            
-            "[VIDEO METADATA]\n"
-            "<video_metadata>\n"
-            "{{VIDEO_METADATA}}\n"
-            "</video_metadata>\n\n"
-            
-            "[VIDEO SCREENSHOTS]\n"
-            "<video_screenshots>\n"
-            "{{VIDEO_SCREENSHOTS}}\n"
-            "</video_screenshots>\n\n"
-            
-            "Carefully review all the provided information. Your goal is to identify 10 key success "
-            "factors that contributed to the video's effectiveness. For each success factor, you will "
-            "provide a detailed analysis following this structure:\n\n"
-            
-            "## Success Factor #[number]: [Strategy Name]\n"
-            "- What They Did: [specific technique used]\n"
-            "- Why It Works: [psychological or strategic explanation]\n"
-            "- Example From Video: [concrete example]\n"
-            "- How To Apply: [actionable implementation tip]\n\n"
-            
-            "Consider these aspects in your analysis:\n"
-            "- Hook and opening sequence\n"
-            "- Narrative structure\n"
-            "- Audience engagement techniques\n"
-            "- Visual presentation\n"
-            "- Content pacing\n"
-            "- Emotional triggers\n"
-            "- Call-to-action effectiveness\n"
-            "- Title and thumbnail strategy\n"
-            "- Audio/voice techniques\n"
-            "- Unique differentiators\n\n"
-            
-            "Your insights should be:\n"
-            "- Specific and actionable (not generic advice)\n"
-            "- Supported by evidence from the video\n"
-            "- Applicable to other content creators\n"
-            "- Focused on replicable techniques\n\n"
-            
-            "After identifying and analyzing the 10 success factors, conclude with a brief summary "
-            "of the most essential success factor that other creators should prioritize implementing first.\n\n"
-            
-            "Format your entire response as follows:\n\n"
-            
-            "<analysis>\n"
-            "# Top 10 Success Factors Analysis\n\n"
-            
-            "[Insert your 10 success factors here, formatted as specified above]\n\n"
-            
-            "# Conclusion\n\n"
+        """Return the analysis prompt."""
+        return self._ANALYSIS_PROMPT
+
+    def _prepare_request(self, output_path: Optional[str] = None) -> Tuple[Path, Dict]:
+        """Resolve the output path and build the Claude API request parameters."""
+        if not output_path:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            output_path = self.folder_path / f'{self.OUTPUT_PREFIX}{timestamp}.md'
+        else:
+            output_path = Path(output_path)
             
-            "[Insert your brief conclusion here, highlighting the most essential success factor]\n"
-            "</analysis>\n\n"
+        # Process all files
+        image_contents, text_contents = self._process_files()
+        
+        # Mark the last frame as a cache breakpoint so the system prompt and frames
+        # are reused from Claude's prompt cache on repeat runs
+        if image_contents:
+            image_contents[-1] = {**image_contents[-1], 'cache_control': {'type': 'ephemeral'}}
+        
+        # Prepare message content; appending to the image list and sending the
+        # file contents as their own block avoids copying either of them
+        message_content = image_contents
+        message_content.append({
+            'type': 'text',
+            'text': "Please analyze this YouTube video based on the following content:"
+        })
+        if text_contents:
+            message_content.append({'type': 'text', 'text': text_contents})
+        
+        betas = ['prompt-caching-2024-07-31']
+        if self.use_files_api:
+            betas.append('files-api-2025-04-14')
+        
+        request = {
+            'model': "claude-3-5-sonnet-20241022",
+            'max_tokens': 5000,
+            'temperature': 0.3,
+            'system': [{
+                'type': 'text',
+                'text': self.generate_prompt(),
+                'cache_control': {'type': 'ephemeral'}
+            }],
+            'messages': [{
+                'role': 'user',
+                'content': message_content
+            }],
+            'extra_headers': {'anthropic-beta': ','.join(betas)}
+        }
+        return output_path, request
+
+    def _rejected_upload(self, error: APIStatusError, request: Dict) -> bool:
+        """
+        Check whether the API rejected one of the cached file_ids.
+
+        Only an invalid_request_error naming a file_id from the request, or a
+        not_found_error for a file, counts; other 400s are left to the caller.
+        If so, the cached ids are dropped so the retry uploads the frames again;
+        a file deleted server-side would otherwise fail every later run.
+        """
+        if not self.use_files_api or error.status_code not in (400, 404):
+            return False
+        details = error.body.get('error') if isinstance(error.body, dict) else None
+        if not isinstance(details, dict):
+            return False
+        error_type = details.get('type')
+        message = details.get('message') or ''
+        if error_type == 'invalid_request_error':
+            file_ids = {
+                block['source']['file_id'] for block in request['messages'][0]['content']
+                if block.get('type') == 'image' and block['source'].get('type') == 'file'
+            }
+            if not any(file_id in message for file_id in file_ids):
+                return False
+        elif error_type != 'not_found_error' or 'file' not in message.lower():
+            return False
+        logger.warning("Claude API rejected the uploaded frames, uploading them again: %s", message)
+        for cache_path in self._cache_dir.glob('*-file'):
+            cache_path.unlink(missing_ok=True)
+        return True
+
+    @staticmethod
+    def _stream_analysis(client, request: Dict, output_path: Path) -> None:
+        """Stream the response from Claude API straight into the output file."""
+        with client.messages.stream(**request) as stream, \
+                open(output_path, 'w', encoding='utf-8') as f:
+            for text in stream.text_stream:
+                f.write(text)
+                f.flush()
+
+    @staticmethod
+    async def _create_async(client: AsyncAnthropic, request: Dict,
+                            semaphore: Optional[asyncio.Semaphore] = None):
+        """Send the request, holding the semaphore if one is given."""
+        if semaphore:
+            async with semaphore:
+                return await client.messages.create(**request)
+        return await client.messages.create(**request)
+
+    def _save_analysis(self, analysis: str, output_path: Path) -> str:
+        """Save the analysis text to the output file."""
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(analysis)
             
-            "Remember to base all your insights on the provided video transcript, metadata, and "
-            "screenshot descriptions. Do not make assumptions about content that isn't explicitly "
-            "mentioned in the provided information."
-        )
+        logger.info("Analysis saved to: %s", output_path)
+        return str(output_path)
 
     def generate_analysis(self, output_path: Optional[str] = None) -> str:
         """Generate analysis and save it as a markdown file using Claude API.
@@ -216,75 +581,150 @@ class VideoAnalyzer:
         Returns:
             Path to the generated markdown file
         """
-        if not output_path:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_path = self.folder_path / f'video_analysis_{timestamp}.md'
-        else:
-            output_path = Path(output_path)
-            
-        # Process all files
-        image_contents, text_contents = self._process_files()
-        
-        # Prepare message content
-        message_content = image_contents + [{
-            'type': 'text',
-            'text': f"Please analyze this YouTube video based on the following content:\n\n{text_contents}\n\n{self.generate_prompt()}"
-        }]
+        output_path, request = self._prepare_request(output_path)
         
         try:
-            # Initialize Anthropic client
-            client = Anthropic()
+            client = get_client()
             
-            # Create message using Claude API
             logger.info("Sending request to Claude API...")
-            response = client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=5000,
-                temperature=0.3,
-                messages=[{
-                    'role': 'user',
-                    'content': message_content
-                }]
-            )
+            try:
+                self._stream_analysis(client, request, output_path)
+            except (BadRequestError, NotFoundError) as e:
+                if not self._rejected_upload(e, request):
+                    raise
+                output_path, request = self._prepare_request(output_path)
+                self._stream_analysis(client, request, output_path)
             logger.info("Received response from Claude API")
             
-            analysis = response.content[0].text
-            
-            # Save the analysis to file
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(analysis)
-                
-            logger.info(f"Analysis saved to: {output_path}")
+            logger.info("Analysis saved to: %s", output_path)
             return str(output_path)
             
         except Exception as e:
-            logger.error(f"Error calling Claude API: {str(e)}")
+            logger.error("Error calling Claude API: %s", e)
+            raise
+
+    async def generate_analysis_async(self, output_path: Optional[str] = None,
+                                      semaphore: Optional[asyncio.Semaphore] = None,
+                                      client: Optional[AsyncAnthropic] = None) -> str:
+        """Asynchronous version of generate_analysis for analyzing several folders concurrently.
+
+        Args:
+            output_path: Optional path for the output file. If not provided,
+                will create in the same folder as input.
+            semaphore: Optional semaphore bounding the number of concurrent API requests
+            client: Optional async client to share its connection pool between folders
+
+        Returns:
+            Path to the generated markdown file
+        """
+        # File processing is blocking, so keep it off the event loop
+        output_path, request = await asyncio.to_thread(self._prepare_request, output_path)
+        
+        try:
+            if client is None:
+                client = async_client()
+            
+            logger.info("Sending request to Claude API for %s...", self.folder_path)
+            try:
+                response = await self._create_async(client, request, semaphore)
+            except (BadRequestError, NotFoundError) as e:
+                if not self._rejected_upload(e, request):
+                    raise
+                output_path, request = await asyncio.to_thread(self._prepare_request, output_path)
+                response = await self._create_async(client, request, semaphore)
+            logger.info("Received response from Claude API for %s", self.folder_path)
+            
+            return self._save_analysis(response.content[0].text, output_path)
+            
+        except Exception as e:
+            logger.error("Error calling Claude API: %s", e)
             raise
 
+async def analyze_folders(folder_paths: List[str], max_concurrent: int = 4,
+                          max_frames: Optional[int] = VideoAnalyzer.DEFAULT_MAX_FRAMES,
+                          use_files_api: bool = False) -> List:
+    """
+    Analyze several folders concurrently.
+
+    Args:
+        folder_paths: Paths to folders containing video-related files
+        max_concurrent: Maximum number of API requests in flight at once
+        max_frames: Maximum number of frames to send per folder
+        use_files_api: Upload frames via the Files API instead of inlining them as base64
+
+    Returns:
+        List with the output path, or the raised exception, for each folder
+    """
+    semaphore = asyncio.Semaphore(max_concurrent)
+    async with async_client() as client:
+        return await asyncio.gather(
+            *[VideoAnalyzer(path, max_frames, use_files_api).generate_analysis_async(
+                  semaphore=semaphore, client=client)
+              for path in folder_paths],
+            return_exceptions=True
+        )
+
 def main():
     """Main function to handle command line arguments and run analysis."""
     parser = argparse.ArgumentParser(
         description='Analyze video-related files and generate popularity insights.'
     )
     parser.add_argument(
-        'folder_path',
-        help='Path to the folder containing video-related files'
+        'folder_paths',
+        nargs='+',
+        help='Path(s) to the folder(s) containing video-related files'
     )
     parser.add_argument(
         '--output',
-        help='Path for the output markdown file',
+        help='Path for the output markdown file (single folder only)',
         default=None
     )
+    parser.add_argument(
+        '--max-concurrent',
+        type=int,
+        help='Maximum number of concurrent API requests when analyzing several folders',
+        default=4
+    )
+    parser.add_argument(
+        '--max-frames',
+        type=int,
+        help='Maximum number of evenly spaced frames to send per folder (0 for all)',
+        default=VideoAnalyzer.DEFAULT_MAX_FRAMES
+    )
+    parser.add_argument(
+        '--upload-files',
+        action='store_true',
+        help='Upload frames via the Anthropic Files API instead of sending them as base64'
+    )
     
     args = parser.parse_args()
     
-    try:
-        analyzer = VideoAnalyzer(args.folder_path)
-        output_path = analyzer.generate_analysis(args.output)
-        print(f"Analysis completed successfully. Output saved to: {output_path}")
-    except Exception as e:
-        logger.error(f"Analysis failed: {str(e)}")
-        raise
+    if args.output and len(args.folder_paths) > 1:
+        parser.error('--output can only be used with a single folder')
+    if args.max_frames < 0:
+        parser.error('--max-frames must be 0 or more')
+    
+    if len(args.folder_paths) == 1:
+        try:
+            analyzer = VideoAnalyzer(args.folder_paths[0], args.max_frames, args.upload_files)
+            output_path = analyzer.generate_analysis(args.output)
+            print(f"Analysis completed successfully. Output saved to: {output_path}")
+        except Exception as e:
+            logger.error("Analysis failed: %s", e)
+            raise
+        return
+    
+    results = asyncio.run(analyze_folders(args.folder_paths, args.max_concurrent, args.max_frames,
+                                        args.upload_files))
+    failed = 0
+    for folder_path, result in zip(args.folder_paths, results):
+        if isinstance(result, Exception):
+            failed += 1
+            logger.error("Analysis failed for %s: %s", folder_path, result)
+        else:
+            print(f"Analysis completed successfully. Output saved to: {result}")
+    if failed:
+        raise SystemExit(1)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -5,13 +5,25 @@ python -m utility.youtube_comments_reply '/Users/yuanlu/Desktop/YC/comment video
 """
 import os
 import argparse
+import asyncio
+import mmap
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, List, Dict
 import logging
-import json
-from anthropic import Anthropic
+from functools import lru_cache
+from string import Template
+from anthropic import AsyncAnthropic
 from datetime import datetime
 
+try:
+    # Run as `python -m utility.youtube_comments_reply`
+    from .anthropic_client import async_client
+    from .json_utils import json_dumps_line, json_loads
+except ImportError:
+    # Run as a script from the utility directory
+    from anthropic_client import async_client
+    from json_utils import json_dumps_line, json_loads
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -19,10 +31,31 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Comment files larger than this are memory-mapped and parsed in place
+# instead of being read into memory first
+_MMAP_THRESHOLD = 64 * 1024 * 1024
+
+@lru_cache(maxsize=1)
+def _read_prompt_template(prompt_path: Path) -> str:
+    """Read a prompt template, caching it so repeated CommentReplier instances don't re-read it."""
+    with open(prompt_path, 'r', encoding='utf-8') as file:
+        return file.read()
+
 class CommentReplier:
     """
     A class to generate replies for YouTube comments using Claude API.
     """
+    # Maximum number of reply requests in flight at once
+    MAX_CONCURRENT_REQUESTS = 8
+
+    # Reply prompt; everything before the comment text is filled in once per replier
+    _PROMPT_PREFIX = Template("""Based on the following system prompt:
+
+$persona
+
+Please generate a direct, friendly reply for this YouTube comment based on the persona. No explanations or preambles needed:
+""")
+
     def __init__(self, api_key: str = None, prompt_path: Path = None):
         """
         Initialize the CommentReplier.
@@ -31,9 +64,10 @@ class CommentReplier:
             api_key (str, optional): Anthropic API key. Defaults to environment variable.
             prompt_path (Path, optional): Path to custom prompt template. Defaults to None.
         """
-        self.client = Anthropic(api_key=api_key)
+        self.api_key = api_key
         self.prompt_path = prompt_path
         self.prompt_template = self._load_prompt_template()
+        self._prompt_prefix = self._PROMPT_PREFIX.substitute(persona=self.prompt_template)
 
     def _load_prompt_template(self) -> str:
         """Load the prompt template from the markdown file."""
@@ -41,8 +75,7 @@ class CommentReplier:
         default_path = Path(__file__).parent.parent / 'prompt' / 'prompt_persona.md'
         prompt_path = self.prompt_path or default_path
         try:
-            with open(prompt_path, 'r', encoding='utf-8') as file:
-                return file.read()
+            return _read_prompt_template(Path(prompt_path))
         except FileNotFoundError:
             logger.error(f"Prompt template not found at {prompt_path}")
             raise
@@ -58,67 +91,82 @@ class CommentReplier:
             List[Dict]: List of comment dictionaries
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # Log the structure of the loaded data
-                logger.debug(f"Loaded data structure: {type(data)}")
-                
-                # Handle different possible JSON structures
-                if isinstance(data, list):
-                    if all(isinstance(item, str) for item in data):
-                        # Convert simple strings to comment objects
-                        return [{'text': comment, 'id': str(i)} for i, comment in enumerate(data)]
-                    return data
-                elif isinstance(data, dict):
-                    # If it's a dictionary with a comments key
-                    if 'comments' in data:
-                        return data['comments']
-                    # If it's a single comment
-                    return [data]
+            with open(file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size > _MMAP_THRESHOLD:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                            memoryview(mm) as view:
+                        data = json_loads(view)
                 else:
-                    raise ValueError(f"Unexpected data format in {file_path}")
+                    data = json_loads(f.read())
+            # Log the structure of the loaded data
+            logger.debug(f"Loaded data structure: {type(data)}")
+            
+            # Handle different possible JSON structures
+            if isinstance(data, list):
+                if all(isinstance(item, str) for item in data):
+                    # Convert simple strings to comment objects
+                    return [{'text': comment, 'id': str(i)} for i, comment in enumerate(data)]
+                return data
+            elif isinstance(data, dict):
+                # If it's a dictionary with a comments key
+                if 'comments' in data:
+                    return data['comments']
+                # If it's a single comment
+                return [data]
+            else:
+                raise ValueError(f"Unexpected data format in {file_path}")
         except Exception as e:
             logger.error(f"Error loading comments from {file_path}: {str(e)}")
             raise
 
-    def _generate_reply(self, comment: Dict) -> str:
+    def _build_request(self, comment: Dict) -> Dict:
         """
-        Generate a reply for a single comment using Claude API.
+        Build the Claude API request parameters for a single comment.
 
         Args:
             comment (Dict): Comment dictionary containing the comment data
 
         Returns:
-            str: Generated reply
+            Dict: Keyword arguments for messages.create
         """
-        try:
-            # Extract comment text based on different possible structures
-            comment_text = (
-                comment.get('text') or 
-                comment.get('comment') or 
-                comment.get('content') or 
-                comment if isinstance(comment, str) else 
-                str(comment)
-            )
+        # Extract comment text based on different possible structures
+        comment_text = (
+            comment.get('text') or 
+            comment.get('comment') or 
+            comment.get('content') or 
+            comment if isinstance(comment, str) else 
+            str(comment)
+        )
 
-            # Prepare the prompt with the comment context
-            prompt = f"""Based on the following system prompt:
+        # Prepare the prompt with the comment context
+        prompt = self._prompt_prefix + comment_text
 
-{self.prompt_template}
+        return {
+            'model': "claude-3-5-sonnet-20241022",
+            'max_tokens': 1000,
+            'temperature': 0.7,
+            'messages': [
+                {'role': 'user', 'content': prompt},
+                {'role': 'assistant', 'content': '<direct reply>'}  # Prefill to force direct response
+            ]
+        }
 
-Please generate a direct, friendly reply for this YouTube comment based on the persona. No explanations or preambles needed:
-{comment_text}"""
-
-            # Call Claude API with prefilled response
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1000,
-                temperature=0.7,
-                messages=[
-                    {'role': 'user', 'content': prompt},
-                    {'role': 'assistant', 'content': '<direct reply>'}  # Prefill to force direct response
-                ]
-            )
+    async def _generate_reply_async(self, client: AsyncAnthropic, comment: Dict,
+                                    semaphore: asyncio.Semaphore) -> str:
+        """
+        Generate a reply for a single comment using the async Claude API client.
+
+        Args:
+            client (AsyncAnthropic): Async client shared by all requests in the batch
+            comment (Dict): Comment dictionary containing the comment data
+            semaphore (asyncio.Semaphore): Limits the number of requests in flight
+
+        Returns:
+            str: Generated reply
+        """
+        try:
+            async with semaphore:
+                response = await client.messages.create(**self._build_request(comment))
             
             return response.content[0].text
 
@@ -126,44 +174,128 @@ Please generate a direct, friendly reply for this YouTube comment based on the p
             logger.error(f"Error generating reply: {str(e)}")
             return f"Error generating reply: {str(e)}"
 
+    async def _generate_replies_async(self, client: AsyncAnthropic, semaphore: asyncio.Semaphore,
+                                      comments: List[Dict],
+                                      on_reply: Callable[[int, str], None]) -> None:
+        """
+        Generate replies for many comments concurrently.
+
+        Args:
+            client (AsyncAnthropic): Async client shared by all requests
+            semaphore (asyncio.Semaphore): Limits the number of requests in flight
+            comments (List[Dict]): Comment dictionaries
+            on_reply (Callable[[int, str], None]): Called with the comment index and
+                reply as soon as each reply arrives
+        """
+        # A fixed pool of workers pulls from one shared iterator, so only
+        # MAX_CONCURRENT_REQUESTS coroutines exist per file however many comments it has
+        pending = enumerate(comments)
+
+        async def worker() -> None:
+            for index, comment in pending:
+                on_reply(index, await self._generate_reply_async(client, comment, semaphore))
+
+        await asyncio.gather(*[worker() for _ in range(min(self.MAX_CONCURRENT_REQUESTS, len(comments)))])
+
+    async def process_files_async(self, file_paths: List[Path]) -> List:
+        """
+        Process several comments files concurrently.
+
+        All files share one client and one limit on requests in flight.
+        Use this from code that already runs an event loop, such as a notebook.
+
+        Args:
+            file_paths (List[Path]): Paths to comments JSON files
+
+        Returns:
+            List: The output path, or the raised exception, for each file
+        """
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        async with async_client(self.api_key) as client:
+            return await asyncio.gather(
+                *[self.process_comments_file_async(file_path, client, semaphore)
+                  for file_path in file_paths],
+                return_exceptions=True
+            )
+
+    @staticmethod
+    def _run(coro):
+        """
+        Run a coroutine to completion from synchronous code.
+
+        asyncio.run cannot be nested, so calling the synchronous entry points
+        from a running event loop (e.g. a notebook) raises a RuntimeError that
+        points to process_files_async instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        coro.close()
+        raise RuntimeError(
+            "CommentReplier's synchronous methods cannot run inside an event loop; "
+            "use `await replier.process_files_async(paths)` instead"
+        )
+
     def process_comments_file(self, file_path: Path) -> Path:
         """
         Process a single comments file and generate replies.
 
+        Runs its own event loop; from async code, await process_files_async instead.
+
         Args:
             file_path (Path): Path to the comments JSON file
 
         Returns:
-            Path: Path to the output file with replies
+            Path: Path to the NDJSON output file with replies
+        """
+        [result] = self._run(self.process_files_async([file_path]))
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def process_comments_file_async(self, file_path: Path, client: AsyncAnthropic,
+                                          semaphore: asyncio.Semaphore) -> Path:
+        """
+        Process a single comments file and generate replies.
+
+        Replies are written as newline-delimited JSON as soon as each one
+        arrives, so an interrupted run still leaves valid partial output.
+
+        Args:
+            file_path (Path): Path to the comments JSON file
+            client (AsyncAnthropic): Async client shared by all requests
+            semaphore (asyncio.Semaphore): Limits the number of requests in flight
+
+        Returns:
+            Path: Path to the NDJSON output file with replies
         """
         logger.info(f"Processing comments file: {file_path}")
         
-        # Load comments
-        comments = self._load_comments(file_path)
+        # Load comments; parsing is blocking, so keep it off the event loop
+        comments = await asyncio.to_thread(self._load_comments, file_path)
         logger.info(f"Loaded {len(comments)} comments")
 
-        # Generate replies for each comment
-        processed_comments = []
-        for i, comment in enumerate(comments):
-            comment_id = comment.get('id', f'comment_{i}')
-            logger.info(f"Generating reply for comment ID: {comment_id}")
-            
-            # Create a structured comment object
-            processed_comment = {
-                'id': comment_id,
-                'original_comment': comment if isinstance(comment, str) else comment.get('text', str(comment)),
-                'ai_reply': self._generate_reply(comment)
-            }
-            processed_comments.append(processed_comment)
-
         # Create output filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_path = file_path.parent / f"{file_path.stem}_replies_{timestamp}.json"
+        output_path = file_path.parent / f"{file_path.stem}_replies_{timestamp}.ndjson"
 
-        # Save replies
         try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(processed_comments, f, indent=2, ensure_ascii=False)
+            with open(output_path, 'wb') as f:
+                def write_reply(index: int, reply: str) -> None:
+                    comment = comments[index]
+                    # Create a structured comment object
+                    processed_comment = {
+                        'id': comment.get('id', f'comment_{index}'),
+                        'original_comment': comment if isinstance(comment, str) else comment.get('text', str(comment)),
+                        'ai_reply': reply
+                    }
+                    f.write(json_dumps_line(processed_comment))
+                    f.flush()
+
+                # Generate replies for all comments concurrently
+                logger.info(f"Generating replies for {len(comments)} comments")
+                await self._generate_replies_async(client, semaphore, comments, write_reply)
             logger.info(f"Saved replies to: {output_path}")
             return output_path
         except Exception as e:
@@ -174,6 +306,8 @@ Please generate a direct, friendly reply for this YouTube comment based on the p
         """
         Process all JSON files in the specified folder.
 
+        Runs its own event loop; from async code, await process_files_async instead.
+
         Args:
             folder_path (str | Path): Path to folder containing comment JSON files
 
@@ -191,15 +325,14 @@ Please generate a direct, friendly reply for this YouTube comment based on the p
         if not json_files:
             raise ValueError(f"No JSON files found in {folder_path}")
 
-        # Process each file
+        # Process all files concurrently
         output_files = []
-        for file_path in json_files:
-            try:
-                output_path = self.process_comments_file(file_path)
-                output_files.append(output_path)
-            except Exception as e:
-                logger.error(f"Error processing {file_path}: {str(e)}")
+        results = self._run(self.process_files_async(json_files))
+        for file_path, result in zip(json_files, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error processing {file_path}: {str(result)}")
                 continue
+            output_files.append(result)
 
         return output_files
 
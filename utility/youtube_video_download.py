@@ -29,6 +29,7 @@ Features:
     - Supports multiple quality options (4K, 1080p, 720p, etc.)
     - Optional subtitle download in multiple languages
     - Progress tracking during download
+    - Concurrent downloads of several URLs (YouTubeDownloader.download_videos)
     - Organized output directory structure
     - Detailed logging of download process
 
@@ -46,14 +47,21 @@ Requirements:
 Notes:
     - Videos are saved to 'data/youtube_video' by default
     - Supports both video and audio-only downloads
+    - Completed downloads are recorded in 'data/.downloaded.txt' ('.downloaded_audio.txt'
+      for audio) and skipped on later runs; delete the entry to download again
     - Quality options: 'best', '4k', '1080p', '720p', '480p', '360p', 'worst'
     - Format options: 'video', 'audio', 'mp4', 'webm'
     - Subtitle options: 'en', 'es', 'fr', 'de', etc. (ISO 639-1 codes)
 """
 
+import argparse
 import os
+import shutil
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import List, Optional
 import logging
 import yt_dlp
 import re
@@ -66,9 +74,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Characters that aren't alphanumeric, whitespace or safe special chars
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^a-zA-Z0-9\s\-_]')
+_WHITESPACE_RUN = re.compile(r'\s+')
+
 class YouTubeDownloader:
     """A class to handle YouTube video downloads using yt-dlp."""
 
+    # Output directories already created by this process, shared by all instances
+    _created_dirs = set()
+
     @staticmethod
     def sanitize_filename(title: str) -> str:
         """
@@ -81,13 +96,10 @@ class YouTubeDownloader:
             A sanitized filename with only alphanumeric characters and underscores
         """
         # Remove any characters that aren't alphanumeric, spaces, or safe special chars
-        safe_chars = re.sub(r'[^a-zA-Z0-9\s\-_]', '', title)
+        safe_chars = _UNSAFE_FILENAME_CHARS.sub('', title)
         
-        # Replace multiple spaces with single space and strip
-        safe_chars = ' '.join(safe_chars.split())
-        
-        # Replace spaces with underscores
-        safe_chars = safe_chars.replace(' ', '_')
+        # Replace each run of whitespace with a single underscore
+        safe_chars = _WHITESPACE_RUN.sub('_', safe_chars.strip())
         
         # Ensure the filename isn't empty
         if not safe_chars:
@@ -108,6 +120,10 @@ class YouTubeDownloader:
         # Will be set during download when we know the video title
         self.output_path = None
         self.video_title = None
+
+        # YoutubeDL instances keyed by the download options they were built with,
+        # created on first use and reused so their extractors are only initialized once
+        self._ydl_cache = {}
         
         # Initialize with basic options, path will be set during download
         self.ydl_opts = {
@@ -115,52 +131,106 @@ class YouTubeDownloader:
             'noplaylist': True,
             'restrictfilenames': True,
             'force_filename_sanitization': True,
-            'postprocessor_hooks': [self._sanitize_output_filename],
+            # Fetch DASH/HLS fragments in parallel rather than one at a time
+            'concurrent_fragment_downloads': 8,
         }
+        
+        # Hand downloads to aria2c when installed; it opens several connections per file
+        if shutil.which('aria2c'):
+            self.ydl_opts.update({
+                'external_downloader': {'default': 'aria2c'},
+                'external_downloader_args': {'aria2c': ['-x16', '-s16', '-k1M']},
+            })
+
+    def _archive_path(self, format_type=None) -> Path:
+        """Return the download archive for this format; audio-only downloads are tracked separately."""
+        name = '.downloaded_audio.txt' if format_type == 'audio' else '.downloaded.txt'
+        return self.base_path / name
+
+    def _get_format_options(self, quality=None, format_type=None, subtitles=False) -> dict:
+        """
+        Build download options based on user preferences.
+
+        Returns a new dict, so options from one download never leak into the next.
+        """
+        opts = dict(self.ydl_opts)
+        opts['download_archive'] = str(self._archive_path(format_type))
+        postprocessors = []
 
-    def _sanitize_output_filename(self, d):
-        """Post-processor hook to sanitize the output filename."""
-        if 'filepath' in d:
-            path = Path(d['filepath'])
-            new_name = self.sanitize_filename(path.stem) + path.suffix
-            new_path = path.parent / new_name
-            try:
-                path.rename(new_path)
-                d['filepath'] = str(new_path)
-            except Exception as e:
-                logger.warning(f'Failed to rename file: {e}')
-
-    def _get_format_options(self, quality=None, format_type=None, subtitles=False):
-        """Configure download options based on user preferences."""
         if format_type == 'audio':
-            self.ydl_opts.update({
-                'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                }]
+            opts['format'] = 'bestaudio/best'
+            postprocessors.append({
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
             })
         elif quality:
             if quality == 'best':
-                self.ydl_opts['format'] = 'bestvideo+bestaudio/best'
+                opts['format'] = 'bestvideo+bestaudio/best'
             elif quality == 'worst':
-                self.ydl_opts['format'] = 'worstvideo+worstaudio/worst'
+                opts['format'] = 'worstvideo+worstaudio/worst'
             else:
                 # For specific resolutions like 720p, 1080p, etc.
-                self.ydl_opts['format'] = f'bestvideo[height<={quality[:-1]}]+bestaudio/best'
+                opts['format'] = f'bestvideo[height<={quality[:-1]}]+bestaudio/best'
 
         if subtitles:
-            self.ydl_opts.update({
+            opts.update({
                 'writesubtitles': True,
                 'writeautomaticsub': True,
                 'subtitleslangs': ['en'],
                 'subtitlesformat': 'vtt',
-                'postprocessors': [{
-                    'key': 'FFmpegSubtitlesConvertor',
-                    'format': 'vtt'
-                }]
+            })
+            postprocessors.append({
+                'key': 'FFmpegSubtitlesConvertor',
+                'format': 'vtt'
             })
 
+        if postprocessors:
+            opts['postprocessors'] = postprocessors
+        return opts
+
+    def _get_ydl(self, quality=None, format_type=None, subtitles=False) -> yt_dlp.YoutubeDL:
+        """
+        Return the YoutubeDL for these options.
+
+        The output directory and file name come from the 'video_dir' and
+        'video_file' fields that download_video adds to the video info, so one
+        instance serves every video and files are written with their final names.
+        """
+        key = (quality, format_type, bool(subtitles))
+        ydl = self._ydl_cache.get(key)
+        if ydl is None:
+            ydl_opts = self._get_format_options(quality, format_type, subtitles)
+            ydl_opts['outtmpl'] = str(self.base_path / '%(video_dir)s' / '%(video_file)s.%(ext)s')
+            ydl = self._ydl_cache[key] = yt_dlp.YoutubeDL(ydl_opts)
+        return ydl
+
+    @staticmethod
+    def _resolve_url_result(ydl: yt_dlp.YoutubeDL, info: Optional[dict]) -> Optional[dict]:
+        """
+        Follow unresolved url results until the info describes the video itself.
+
+        Unprocessed extraction can return a reference to another URL (e.g. a watch
+        URL with a playlist parameter) that has no title yet. url_transparent
+        results keep their own fields on top of the resolved ones, except the
+        fields yt-dlp's process_ie_result also leaves to the resolved video.
+        Returns None if the resolved video is already in the download archive.
+        """
+        while info is not None and info.get('_type') in ('url', 'url_transparent'):
+            resolved = ydl.extract_info(info['url'], download=False,
+                                        ie_key=info.get('ie_key'), process=False)
+            if resolved is not None and info['_type'] == 'url_transparent':
+                exempted_fields = {'_type', 'url', 'ie_key'}
+                # Clips keep the clip extractor's id, as in yt-dlp
+                if not info.get('section_start') and not info.get('section_end'):
+                    exempted_fields |= {'id', 'extractor', 'extractor_key'}
+                resolved.update((key, value) for key, value in info.items()
+                                if value is not None and key not in exempted_fields)
+                # A further url result still needs the outer fields laid over it
+                if resolved.get('_type') == 'url':
+                    resolved['_type'] = 'url_transparent'
+            info = resolved
+        return info
+
     def download_video(self, url: str, quality=None, format_type=None, subtitles=False) -> bool:
         """Download a YouTube video with specified options."""
         if not url:
@@ -168,39 +238,70 @@ class YouTubeDownloader:
             return False
 
         try:
-            # First get video info to determine output directory
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-                video_info = ydl.extract_info(url, download=False)
-                self.video_title = self.sanitize_filename(video_info.get('title', 'untitled'))
-                
-                # Create output directory with video name
-                self.output_path = self.base_path / f'video_{self.video_title}'
-                self.output_path.mkdir(parents=True, exist_ok=True)
-                
-                # Update output template with new path
-                self.ydl_opts['outtmpl'] = str(self.output_path / '%(title)s.%(ext)s')
+            ydl = self._get_ydl(quality, format_type, subtitles)
             
-            # Configure format options
-            self._get_format_options(quality, format_type, subtitles)
+            # First get video info to determine output directory. Format selection
+            # and the download run on the same info, so the page is only extracted once.
+            video_info = self._resolve_url_result(
+                ydl, ydl.extract_info(url, download=False, process=False))
             
-            # Download the video
-            with yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
-                logger.info(f'Downloading video: {url}')
-                logger.info(f'Output directory: {self.output_path}')
-                
-                # Download the video
-                ydl.download([url])
-                
-                # Generate metadata file
-                self._generate_metadata(video_info, url, quality, format_type, subtitles)
-                
-                logger.info('Download completed successfully')
+            # yt-dlp checks the archive before fetching anything and returns no info
+            # for videos that were already downloaded
+            if video_info is None:
+                logger.info(f'Already downloaded, skipping: {url}')
                 return True
+            self.video_title = self.sanitize_filename(video_info.get('title', 'untitled'))
+            
+            # Create output directory with video name
+            self.output_path = self.base_path / f'video_{self.video_title}'
+            if self.output_path not in YouTubeDownloader._created_dirs:
+                self.output_path.mkdir(parents=True, exist_ok=True)
+                YouTubeDownloader._created_dirs.add(self.output_path)
+            
+            logger.info(f'Downloading video: {url}')
+            logger.info(f'Output directory: {self.output_path}')
+            
+            # Download from the extracted info; the result includes the selected format.
+            # The output template fields go in extra_info, which yt-dlp carries into
+            # the processed result even when it has to follow a url result first.
+            video_info = ydl.process_ie_result(video_info, download=True, extra_info={
+                'video_dir': self.output_path.name,
+                'video_file': self.video_title,
+            })
+            
+            # Generate metadata file
+            self._generate_metadata(video_info, url, quality, format_type, subtitles)
+            
+            logger.info('Download completed successfully')
+            return True
 
         except Exception as e:
             logger.error(f'Download failed: {str(e)}')
             return False
 
+    def download_videos(self, urls: List[str], quality=None, format_type=None, subtitles=False,
+                        max_parallel: int = 4) -> List[bool]:
+        """
+        Download several YouTube videos concurrently.
+
+        Each worker thread uses its own YouTubeDownloader, since yt-dlp instances
+        and the per-download state on this class are not safe to share between threads.
+
+        Returns:
+            Whether each download succeeded, in the same order as urls
+        """
+        local = threading.local()
+
+        def download(url: str) -> bool:
+            downloader = getattr(local, 'downloader', None)
+            if downloader is None:
+                downloader = local.downloader = type(self)()
+                downloader.base_path = self.base_path
+            return downloader.download_video(url, quality, format_type, subtitles)
+
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            return list(executor.map(download, urls))
+
     def _generate_metadata(self, video_info: dict, url: str, quality=None, format_type=None, subtitles=False):
         """Generate metadata file with download and video information."""
         try:
@@ -208,93 +309,99 @@ class YouTubeDownloader:
             video_title = self.sanitize_filename(video_info.get('title', 'untitled'))
             metadata_path = Path(self.output_path) / f'{video_title}_metadata.txt'
             
-            with open(metadata_path, 'w', encoding='utf-8') as f:
-                f.write(f"YouTube Video Metadata:\n")
-                f.write(f"====================\n\n")
+            parts = [
+                "YouTube Video Metadata:\n",
+                "====================\n\n",
                 
                 # Video Information
-                f.write(f"Video Information:\n")
-                f.write(f"- Title: {video_info.get('title', 'N/A')}\n")
-                f.write(f"- Channel: {video_info.get('channel', 'N/A')}\n")
-                f.write(f"- Upload Date: {video_info.get('upload_date', 'N/A')}\n")
-                f.write(f"- Duration: {video_info.get('duration_string', 'N/A')}\n")
-                f.write(f"- View Count: {video_info.get('view_count', 'N/A')}\n")
-                f.write(f"- Like Count: {video_info.get('like_count', 'N/A')}\n")
-                f.write(f"- Original URL: {url}\n")
+                "Video Information:\n",
+                f"- Title: {video_info.get('title', 'N/A')}\n",
+                f"- Channel: {video_info.get('channel', 'N/A')}\n",
+                f"- Upload Date: {video_info.get('upload_date', 'N/A')}\n",
+                f"- Duration: {video_info.get('duration_string', 'N/A')}\n",
+                f"- View Count: {video_info.get('view_count', 'N/A')}\n",
+                f"- Like Count: {video_info.get('like_count', 'N/A')}\n",
+                f"- Original URL: {url}\n",
                 
                 # Video Description
-                f.write(f"\nVideo Description:\n")
-                f.write(f"{video_info.get('description', 'N/A')}\n")
+                "\nVideo Description:\n",
+                f"{video_info.get('description', 'N/A')}\n",
                 
                 # Download Settings
-                f.write(f"\nDownload Settings:\n")
-                f.write(f"- Quality: {quality if quality else 'default'}\n")
-                f.write(f"- Format: {format_type if format_type else 'mp4'}\n")
-                f.write(f"- Subtitles: {'Yes' if subtitles else 'No'}\n")
+                "\nDownload Settings:\n",
+                f"- Quality: {quality if quality else 'default'}\n",
+                f"- Format: {format_type if format_type else 'mp4'}\n",
+                f"- Subtitles: {'Yes' if subtitles else 'No'}\n",
                 
                 # Technical Details
-                f.write(f"\nTechnical Details:\n")
-                f.write(f"- Format ID: {video_info.get('format_id', 'N/A')}\n")
-                f.write(f"- Resolution: {video_info.get('resolution', 'N/A')}\n")
-                f.write(f"- FPS: {video_info.get('fps', 'N/A')}\n")
-                f.write(f"- Video Codec: {video_info.get('vcodec', 'N/A')}\n")
-                f.write(f"- Audio Codec: {video_info.get('acodec', 'N/A')}\n")
-                
-                # Tags and Categories
-                if video_info.get('tags'):
-                    f.write(f"\nTags:\n")
-                    for tag in video_info.get('tags', []):
-                        f.write(f"- {tag}\n")
-                
+                "\nTechnical Details:\n",
+                f"- Format ID: {video_info.get('format_id', 'N/A')}\n",
+                f"- Resolution: {video_info.get('resolution', 'N/A')}\n",
+                f"- FPS: {video_info.get('fps', 'N/A')}\n",
+                f"- Video Codec: {video_info.get('vcodec', 'N/A')}\n",
+                f"- Audio Codec: {video_info.get('acodec', 'N/A')}\n",
+            ]
+            
+            # Tags and Categories
+            if tags := video_info.get('tags'):
+                parts.append("\nTags:\n")
+                parts.extend(f"- {tag}\n" for tag in tags)
+            
+            parts += [
                 # Processing Information
-                f.write(f"\nProcessing Information:\n")
-                f.write(f"- Download Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"- Output Directory: {self.output_path}\n")
-                f.write(f"- Filename: {video_title}\n")
+                "\nProcessing Information:\n",
+                f"- Download Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+                f"- Output Directory: {self.output_path}\n",
+                f"- Filename: {video_title}\n",
                 
                 # File Locations
-                f.write(f"\nFile Locations:\n")
-                f.write(f"- Video File: {video_title}.{format_type if format_type == 'audio' else 'mp4'}\n")
-                if subtitles:
-                    f.write(f"- Subtitle File: {video_title}.en.vtt\n")
+                "\nFile Locations:\n",
+                f"- Video File: {video_title}.{format_type if format_type == 'audio' else 'mp4'}\n",
+            ]
+            if subtitles:
+                parts.append(f"- Subtitle File: {video_title}.en.vtt\n")
+            
+            # Write the whole file in one call
+            with open(metadata_path, 'w', encoding='utf-8') as f:
+                f.write(''.join(parts))
                 
-                logger.info(f'Generated metadata file: {metadata_path}')
+            logger.info(f'Generated metadata file: {metadata_path}')
                 
         except Exception as e:
             logger.warning(f'Failed to generate metadata file: {e}')
 
+_PARSER = argparse.ArgumentParser(
+    description='Download YouTube videos using yt-dlp.',
+    usage="python youtube_video_download.py url='YOUR_YOUTUBE_URL' [quality='720p'] [format='audio'] [subtitles='en']"
+)
+_PARSER.add_argument('--url', required=True, help='YouTube video URL')
+_PARSER.add_argument('--quality', help="Quality: 'best', '4k', '1080p', '720p', '480p', '360p', 'worst'")
+_PARSER.add_argument('--format', dest='format_type', help="Format: 'video', 'audio', 'mp4', 'webm'")
+_PARSER.add_argument('--subtitles', help="Subtitle language code, e.g. 'en'")
+
 def parse_args(args):
-    """Parse command line arguments in the format key='value'."""
-    params = {}
+    """Parse command line arguments in the format key='value' (--key=value also works)."""
+    argv = []
     for arg in args:
-        if '=' in arg:
-            key, value = arg.split('=', 1)
+        key, sep, value = arg.partition('=')
+        if sep and not key.startswith('-'):
             # Remove any quotes around the value
             value = value.strip('\'"')
-            params[key] = value
-    return params
+            arg = f'--{key}={value}'
+        argv.append(arg)
+    return _PARSER.parse_args(argv)
 
 def main():
     """Handle command line execution."""
     args = parse_args(sys.argv[1:])
-    
-    if 'url' not in args:
-        print("Usage: python youtube_video_download.py url='YOUR_YOUTUBE_URL' [quality='720p'] [format='audio'] [subtitles='en']")
-        return
 
     downloader = YouTubeDownloader()
-    url = args['url'].strip('@')
-    
-    # Parse optional arguments
-    quality = args.get('quality')
-    format_type = args.get('format')
-    subtitles = bool(args.get('subtitles'))
+    url = args.url.strip('@')
     
-    if downloader.download_video(url, quality, format_type, subtitles):
+    if downloader.download_video(url, args.quality, args.format_type, bool(args.subtitles)):
         print('Video downloaded successfully!')
     else:
         print('Failed to download video.')
 
 if __name__ == '__main__':
     main()
-
@@ -13,11 +13,13 @@ Required Environment Variable:
 
 import os
 import time
+import asyncio
 import logging
 import argparse
+import httpx
 import pandas as pd
 from typing import List, Set
-from screenshotapi_url import ScreenshotAPI
+from screenshotapi_url import ScreenshotAPI, canonicalize_url
 
 # Configure logging
 logging.basicConfig(
@@ -26,95 +28,223 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Rows read from the input CSV at a time
+_CSV_CHUNK_ROWS = 100_000
+
+try:
+    # Arrow-backed strings take less memory than Python str objects and
+    # strip in compiled code
+    import pyarrow  # noqa: F401
+    _CSV_STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    _CSV_STRING_DTYPE = str
+
+class RateLimiter:
+    """
+    Space out calls so they start at most once per interval
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_time = time.monotonic()
+
+    async def wait(self):
+        """
+        Wait until the caller may make its next call
+        """
+        now = time.monotonic()
+        start = max(now, self._next_time)
+        self._next_time = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+def positive_int(value: str) -> int:
+    """
+    argparse type for options that must be at least 1
+    """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
 def load_completed_urls(checkpoint_file: str) -> Set[str]:
     """
     Load previously completed URLs from checkpoint file
     """
     if os.path.exists(checkpoint_file):
         with open(checkpoint_file, 'r', encoding='utf-8') as f:
-            return set(line.strip() for line in f)
+            # Canonicalized so entries written before canonicalization still match
+            return set(canonicalize_url(line.strip()) for line in f)
     return set()
 
-def save_completed_url(checkpoint_file: str, url: str):
+def load_captured_prefixes(output_dir: str) -> Set[str]:
     """
-    Save completed URL to checkpoint file
+    Collect the filename prefixes (one per captured URL) of screenshots already in output_dir
     """
-    with open(checkpoint_file, 'a', encoding='utf-8') as f:
-        f.write(f"{url}\n")
+    try:
+        with os.scandir(output_dir) as entries:
+            return {entry.name.rsplit('_', 1)[0] for entry in entries if entry.name.endswith('.png')}
+    except FileNotFoundError:
+        return set()
 
-def take_screenshots(urls: List[str], api_token: str, output_dir: str, delay: float = 1.0) -> int:
+class CheckpointWriter:
     """
-    Take screenshots of URLs sequentially.
+    Append completed URLs to the checkpoint file in batches.
+    Pending URLs are written and synced every `flush_every` URLs or
+    `flush_interval` seconds, whichever comes first, and on close.
+    """
+    def __init__(self, checkpoint_file: str, flush_every: int = 16, flush_interval: float = 30.0):
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._file = open(checkpoint_file, 'a', encoding='utf-8', buffering=1 << 16)
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+    def add(self, url: str):
+        """
+        Record a completed URL
+        """
+        self._pending.append(f"{url}\n")
+        if (len(self._pending) >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """
+        Write pending URLs and sync them to disk
+        """
+        if self._pending:
+            self._file.write(''.join(self._pending))
+            self._pending.clear()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        """
+        Flush pending URLs and close the checkpoint file
+        """
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+async def take_screenshots(urls: List[str], api_token: str, output_dir: str, delay: float = 1.0,
+                           workers: int = 8) -> int:
+    """
+    Take screenshots of URLs concurrently.
+    At most `workers` captures are in flight, sharing one HTTP connection pool.
+    Requests start at most once per `delay` seconds, so the API rate limit is
+    respected while other captures are still in flight.
     Returns the number of successful captures.
     """
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
     api = ScreenshotAPI(api_token, output_dir=output_dir)
+    limiter = RateLimiter(delay)
     success_count = 0
     
     # Create checkpoint file path
     checkpoint_file = os.path.join(output_dir, 'completed_urls.txt')
     completed_urls = load_completed_urls(checkpoint_file)
-    
-    # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
+    # Screenshots on disk also count, so a lost checkpoint file doesn't mean recapturing
+    captured_prefixes = load_captured_prefixes(output_dir)
 
+    pending = []
     for url in urls:
         # Skip if URL was already processed successfully
-        if url in completed_urls:
-            logger.info(f"⏭ Skipping already processed: {url}")
+        if url in completed_urls or (api.validate_url(url) and api.filename_prefix(url) in captured_prefixes):
+            logger.info("⏭ Skipping already processed: %s", url)
             success_count += 1
-            continue
-
+        else:
+            pending.append(url)
+
+    async def capture(url: str) -> bool:
+        # Invalid URLs fail without an API call, so they don't use up a rate-limit slot
+        if not api.validate_url(url):
+            logger.error("✗ Error with %s: Invalid URL format or unsupported platform", url)
+            return False
+        await limiter.wait()  # Respect API rate limits
         try:
-            if filepath := api.capture(url):
-                logger.info(f"✓ {url} -> {filepath}")
-                save_completed_url(checkpoint_file, url)
-                success_count += 1
-            else:
-                logger.error(f"✗ Failed: {url}")
+            filepath = await api.capture_async(client, url)
         except Exception as e:
-            logger.error(f"✗ Error with {url}: {str(e)}")
-        
-        time.sleep(delay)  # Respect API rate limits
+            logger.error("✗ Error with %s: %s", url, e)
+            return False
+        if filepath:
+            logger.info("✓ %s -> %s", url, filepath)
+            checkpoint.add(url)
+            return True
+        logger.error("✗ Failed: %s", url)
+        return False
+
+    # A fixed pool of workers pulls from one shared iterator, so only `workers`
+    # captures exist at a time no matter how many URLs are pending
+    pending_urls = iter(pending)
+
+    async def worker() -> int:
+        captured = 0
+        for url in pending_urls:
+            captured += await capture(url)
+        return captured
+
+    # One checkpoint handle for the whole run, written in batches
+    try:
+        with CheckpointWriter(checkpoint_file) as checkpoint:
+            # Same connection settings as the ScreenshotAPI session, sized to the worker pool
+            async with httpx.AsyncClient(**api.client_options(),
+                                         limits=httpx.Limits(max_connections=workers)) as client:
+                results = await asyncio.gather(*[worker() for _ in range(workers)])
+    finally:
+        api.close()
     
-    return success_count
+    return success_count + sum(results)
 
 def main():
     parser = argparse.ArgumentParser(description="Batch screenshot capture from CSV")
     parser.add_argument('--input', required=True, help='Input CSV file')
     parser.add_argument('--columns', required=True, help='Column names with URLs (comma-separated)')
     parser.add_argument('--delay', type=float, default=1.0, help='Delay between requests (seconds)')
+    parser.add_argument('--workers', type=positive_int, default=8, help='Number of concurrent captures')
     parser.add_argument('--output', default='screenshots', help='Output directory for screenshots')
     args = parser.parse_args()
 
     try:
-        # Read and prepare URLs
-        df = pd.read_csv(args.input)
+        # Read and prepare URLs; check the header first, then load only the URL columns
         columns = [col.strip() for col in args.columns.split(',')]
+        header = pd.read_csv(args.input, nrows=0).columns
         
-        if missing := set(columns) - set(df.columns):
+        if missing := set(columns) - set(header):
             raise ValueError(f"Columns not found: {', '.join(missing)}")
         
-        urls = []
-        for col in columns:
-            urls.extend(df[col].dropna().tolist())
-        
-        # Clean URLs
-        urls = list(set(url.strip() for url in urls if url.strip()))
-        logger.info(f"Found {len(urls)} unique URLs")
+        # Stream the CSV in chunks and dedup across them in first-seen order,
+        # so only one chunk of rows is held in memory alongside the unique URLs
+        unique_urls = {}
+        for chunk in pd.read_csv(args.input, usecols=columns, dtype=_CSV_STRING_DTYPE, na_filter=False,
+                                 chunksize=_CSV_CHUNK_ROWS):
+            # Clean URLs column by column, then interleave them row by row;
+            # empty cells are read as '' and dropped below
+            stripped = chunk[columns].apply(lambda column: column.str.strip()).to_numpy().ravel()
+            unique_urls.update(dict.fromkeys(pd.unique(stripped)))
+        unique_urls.pop('', None)
+        urls = list(dict.fromkeys(map(canonicalize_url, unique_urls)))
+        logger.info("Found %d unique URLs", len(urls))
 
         # Get API token
         if not (api_token := os.getenv('SCREENSHOT_API_TOKEN')):
             raise ValueError("SCREENSHOT_API_TOKEN not set")
 
         # Process URLs with output directory
-        success_count = take_screenshots(urls, api_token, args.output, args.delay)
+        success_count = asyncio.run(take_screenshots(urls, api_token, args.output, args.delay, args.workers))
         
         # Report results
-        logger.info(f"Completed: {success_count}/{len(urls)} screenshots captured")
+        logger.info("Completed: %d/%d screenshots captured", success_count, len(urls))
         return 0 if success_count else 1
 
     except Exception as e:
-        logger.error(f"Fatal error: {str(e)}")
+        logger.error("Fatal error: %s", e)
         return 1
 
 if __name__ == "__main__":
@@ -1,14 +1,17 @@
 #!/usr/bin/python3
+import asyncio
+import functools
+import hashlib
 import urllib.parse
-import urllib.request
 import os
 import argparse
 import logging
-from typing import Dict, Optional, Tuple
+from typing import Dict, NamedTuple, Optional, Tuple
+import httpx
 from dotenv import load_dotenv
-import ssl
 from datetime import datetime
 import re
+import time
 
 # Configure logging
 logging.basicConfig(
@@ -19,6 +22,18 @@ logging.basicConfig(
     ]
 )
 logger = logging.getLogger(__name__)
+# httpx logs every request URL at INFO, and capture URLs carry the API token
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+try:
+    # HTTP/2 lets concurrent captures share one connection; httpx only
+    # supports it when the h2 package is installed
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+__all__ = ['ScreenshotAPI', 'URLInfo', 'canonicalize_url', 'ScreenshotAPIError', 'URLError', 'APIError', 'RateLimitError']
 
 class ScreenshotAPIError(Exception):
     """Base exception for ScreenshotAPI"""
@@ -32,6 +47,37 @@ class APIError(ScreenshotAPIError):
     """Raised when API request fails"""
     pass
 
+class RateLimitError(APIError):
+    """Raised when the API rejects a request with HTTP 429"""
+    pass
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a URL so trivially different spellings of one page compare equal.
+    
+    Lowercases scheme and host and drops a leading www., any trailing slash
+    and the fragment; the query string is kept.
+    
+    Args:
+        url: URL to normalize
+        
+    Returns:
+        str: Canonical URL, or the input unchanged if it has no host
+    """
+    parsed = urllib.parse.urlsplit(url)
+    if not parsed.netloc:
+        return url
+    host = parsed.netloc.lower().removeprefix('www.')
+    path = parsed.path.rstrip('/')
+    query = f"?{parsed.query}" if parsed.query else ''
+    return f"{parsed.scheme.lower()}://{host}{path}{query}"
+
+class URLInfo(NamedTuple):
+    """Platform details parsed from a capture URL"""
+    platform: str
+    channel_id: str
+    page_type: str
+
 class ScreenshotAPI:
     """Handles screenshot capture using ScreenshotAPI service."""
     
@@ -42,6 +88,22 @@ class ScreenshotAPI:
         'twitter': ['home', 'media', 'likes'],
         'instagram': ['home', 'reels', 'posts']
     }
+    # Supported hosts; subdomains are matched through their parent domain
+    _HOST_PLATFORMS = {
+        'youtube.com': 'youtube',
+        'youtu.be': 'youtube',
+        'twitter.com': 'twitter',
+        'x.com': 'twitter',
+        'instagram.com': 'instagram'
+    }
+    # Characters not allowed in filenames, each mapped to '_'
+    _FILENAME_TRANSLATION = str.maketrans(dict.fromkeys('<>:"/\\|?*', '_'))
+    # Non-home page types of each platform, matched as whole path segments
+    # so a channel named e.g. 'aboutface' is not taken for an 'about' page
+    _PAGE_TYPE_PATTERNS = {
+        platform: re.compile('/(' + '|'.join(t for t in types if t != 'home') + r')(?=[/?#]|$)')
+        for platform, types in SUPPORTED_PAGETYPES.items()
+    }
     
     DEFAULT_OPTIONS = {
         'output': 'image',
@@ -58,35 +120,121 @@ class ScreenshotAPI:
         'retina': 'false'    
     }
     
-    def __init__(self, api_token: str, output_dir: str = 'screenshots'):
+    HTTP2 = _HTTP2
+    # Connect fast, but allow for the server-side render delay
+    HTTP_TIMEOUT = httpx.Timeout(150.0, connect=10.0)
+    HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+    # Multi-megabyte PNGs are written in large chunks to keep write() calls few
+    DOWNLOAD_CHUNK_SIZE = 1 << 20
+    
+    def __init__(self, api_token: str, output_dir: str = 'screenshots', cache_ttl: float = 0):
         """
         Initialize ScreenshotAPI with token and output directory.
         
         Args:
             api_token: API authentication token
             output_dir: Directory for saving screenshots
+            cache_ttl: Reuse a screenshot of the same page taken within this many seconds (0 disables)
         """
         if not api_token:
             raise ValueError("API token is required")
             
         self.api_token = api_token
         self.output_dir = output_dir
+        self.cache_ttl = cache_ttl
+        # Only the target URL changes between captures, so encode the rest once
+        self._query_prefix = f"{self.BASE_URL}?{urllib.parse.urlencode({**self.DEFAULT_OPTIONS, 'token': api_token})}"
         
         # Create output directory if it doesn't exist
         try:
             os.makedirs(output_dir, exist_ok=True)
             # Test write permissions
-            test_file = os.path.join(output_dir, '.test')
-            with open(test_file, 'w') as f:
-                f.write('test')
-            os.remove(test_file)
+            if not os.access(output_dir, os.W_OK | os.X_OK):
+                raise PermissionError("directory is not writable")
         except OSError as e:
             raise OSError(f"Failed to create or write to output directory {output_dir}: {e}")
             
-        # Allow unverified SSL for the API
-        ssl._create_default_https_context = ssl._create_unverified_context
+        # One verifying TLS context for every client of this instance, so CA
+        # certificates load once and TLS sessions can be resumed
+        self.ssl_context = httpx.create_ssl_context()
+        
+        self._session: Optional[httpx.Client] = None
+        
+    @property
+    def session(self) -> httpx.Client:
+        """
+        Pooled session so repeated captures reuse the keep-alive TLS connection.
+        Created on first use, so async-only callers never open it.
+        """
+        if self._session is None:
+            self._session = httpx.Client(**self.client_options(), limits=self.HTTP_LIMITS)
+        return self._session
+        
+    def client_options(self) -> Dict:
+        """
+        Connection settings shared by the sync session and async clients.
+        Redirects are followed the way urlretrieve did.
+        """
+        return {
+            'http2': self.HTTP2,
+            'verify': self.ssl_context,
+            'timeout': self.HTTP_TIMEOUT,
+            'follow_redirects': True,
+        }
+        
+    def close(self):
+        """Close the pooled HTTP session, if one was opened."""
+        if self._session is not None:
+            self._session.close()
         
-    def validate_url(self, url: str) -> bool:
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _classify(url: str) -> Optional[URLInfo]:
+        """
+        Parse a URL once into its platform, channel ID and page type.
+        Classification depends only on the URL string, so it is memoized per URL.
+        
+        Args:
+            url: Target URL
+            
+        Returns:
+            Optional[URLInfo]: URL details, or None if the URL is malformed or unsupported
+        """
+        try:
+            result = urllib.parse.urlparse(url)
+            host = result.hostname
+        except ValueError:
+            return None
+        if not result.scheme or not host:
+            return None
+            
+        # Match the host or any parent domain, so subdomains like m.youtube.com count
+        domain = host
+        while (platform := ScreenshotAPI._HOST_PLATFORMS.get(domain)) is None:
+            if '.' not in domain:
+                return None
+            domain = domain.split('.', 1)[1]
+            
+        if platform == 'youtube':
+            if '@' in url:
+                channel_id = url.split('@')[-1].split('/')[0]
+            else:
+                channel_id = url.split('/')[-1]
+        else:
+            channel_id = url.split('/')[-1].split('?')[0]
+            
+        # The page type is the last matching segment, e.g. /c/about/videos is 'videos'
+        page_types = ScreenshotAPI._PAGE_TYPE_PATTERNS[platform].findall(url.lower())
+        return URLInfo(platform, channel_id, page_types[-1] if page_types else 'home')
+        
+    @staticmethod
+    def validate_url(url: str) -> bool:
         """
         Validate if URL is properly formatted and from supported platform.
         
@@ -96,127 +244,198 @@ class ScreenshotAPI:
         Returns:
             bool: True if URL is valid, False otherwise
         """
-        try:
-            result = urllib.parse.urlparse(url)
-            if not all([result.scheme, result.netloc]):
-                return False
-                
-            domain = result.netloc.lower()
-            return any(platform in domain for platform in ['youtube.com', 'youtu.be', 'twitter.com', 'x.com', 'instagram.com'])
-        except Exception:
-            return False
-        
-    def _sanitize_filename(self, text: str) -> str:
+        return ScreenshotAPI._classify(url) is not None
+        
+    @staticmethod
+    def _sanitize_filename(text: str) -> str:
         """Remove invalid characters from filename."""
-        return re.sub(r'[<>:"/\\|?*]', '_', text)
+        return text.translate(ScreenshotAPI._FILENAME_TRANSLATION)
     
-    def _extract_platform_info(self, url: str) -> Tuple[str, str]:
+    def _generate_filename(self, url: str) -> str:
         """
-        Extract platform and channel ID from URL.
+        Generate filename using format: platform_channelid_pagetype_urlhash_timestamp.png
         
         Args:
             url: Target URL
             
         Returns:
-            Tuple[str, str]: (platform, channel_id)
+            str: Generated filename
+        """
+        # Generate timestamp
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
         
+        # Combine components
+        filename = f"{self.filename_prefix(url)}_{timestamp}.png"
+        
+        return filename
+    
+    @staticmethod
+    def filename_prefix(url: str) -> str:
+        """
+        Build the platform_channelid_pagetype_urlhash part of a filename.
+        Channel IDs and page types alone are not unique (every /channel/<id>/videos
+        URL yields youtube_videos_videos), so a short hash of the URL is appended
+        to give each URL its own prefix.
+        
+        Args:
+            url: Target URL
+            
+        Returns:
+            str: Filename prefix
+            
         Raises:
             URLError: If platform is not supported
         """
-        url_lower = url.lower()
-        
-        # YouTube
-        if 'youtube.com' in url_lower or 'youtu.be' in url_lower:
-            if '@' in url:
-                channel_id = url.split('@')[-1].split('/')[0]
-            else:
-                channel_id = url.split('/')[-1]
-            return 'youtube', channel_id
+        # Built from the canonical URL, so spellings of one page share captures and cache hits
+        canonical_url = canonicalize_url(url)
+        info = ScreenshotAPI._classify(canonical_url)
+        if info is None:
+            raise URLError(f"Unsupported platform URL: {url}")
             
-        # Twitter
-        elif 'twitter.com' in url_lower or 'x.com' in url_lower:
-            channel_id = url.split('/')[-1].split('?')[0]
-            return 'twitter', channel_id
+        # Sanitize components
+        channel_id = ScreenshotAPI._sanitize_filename(info.channel_id)
+        
+        url_hash = hashlib.blake2b(canonical_url.encode(), digest_size=4).hexdigest()
+        
+        return f"{info.platform}_{channel_id}_{info.page_type}_{url_hash}"
+        
+    @staticmethod
+    def _retry_wait(error: Exception, attempt: int, retry_delay: float) -> float:
+        """Seconds to wait before retrying; rate-limited requests back off exponentially."""
+        if isinstance(error, RateLimitError):
+            return retry_delay * 2 ** attempt
+        return retry_delay
+        
+    def _cached_capture(self, url: str, custom_options: Optional[Dict] = None) -> Optional[str]:
+        """
+        Find a recent screenshot of the same page that can be reused instead of calling the API.
+        Screenshots are matched on their filename prefix, which includes a hash of
+        the canonical URL, so only captures of this exact page are reused.
+        
+        Args:
+            url: Target URL to capture
+            custom_options: Optional custom API parameters
             
-        # Instagram
-        elif 'instagram.com' in url_lower:
-            channel_id = url.split('/')[-1].split('?')[0]
-            return 'instagram', channel_id
+        Returns:
+            Optional[str]: Path to the newest screenshot younger than cache_ttl, or None
+        """
+        # Custom options change the image, so only default captures are reused
+        if not self.cache_ttl or custom_options:
+            return None
             
-        else:
-            raise URLError(f"Unsupported platform URL: {url}")
-    
-    def _detect_page_type(self, url: str, platform: str) -> str:
+        prefix = self.filename_prefix(url)
+        newest_path, newest_mtime = None, time.time() - self.cache_ttl
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.png') and entry.name.rsplit('_', 1)[0] == prefix:
+                    mtime = entry.stat().st_mtime
+                    if mtime > newest_mtime:
+                        newest_path, newest_mtime = entry.path, mtime
+        return newest_path
+        
+    def _prepare_capture(self, url: str, custom_options: Optional[Dict] = None) -> Tuple[str, str]:
         """
-        Detect page type from URL.
+        Build the API query URL and output path for a capture.
         
         Args:
-            url: Target URL
-            platform: Platform name
+            url: Target URL to capture
+            custom_options: Optional custom API parameters
             
         Returns:
-            str: Page type
+            Tuple[str, str]: (query URL, output path)
         """
-        url_lower = url.lower()
+        # Generate filename
+        filename = self._generate_filename(url)
+        output_path = os.path.join(self.output_dir, filename)
         
-        if platform == 'youtube':
-            if '/videos' in url_lower:
-                return 'videos'
-            elif '/playlists' in url_lower:
-                return 'playlists'
-            elif '/community' in url_lower:
-                return 'community'
-            elif '/channels' in url_lower:
-                return 'channels'
-            elif '/about' in url_lower:
-                return 'about'
-            else:
-                return 'home'
-                
-        elif platform == 'twitter':
-            if '/media' in url_lower:
-                return 'media'
-            elif '/likes' in url_lower:
-                return 'likes'
-            else:
-                return 'home'
-                
-        elif platform == 'instagram':
-            if '/reels' in url_lower:
-                return 'reels'
-            elif '/posts' in url_lower:
-                return 'posts'
-            else:
-                return 'home'
-                
-        return 'home'
-    
-    def _generate_filename(self, url: str) -> str:
+        if not custom_options:
+            query = f"{self._query_prefix}&{urllib.parse.urlencode({'url': url})}"
+            return query, output_path
+        
+        # Prepare parameters
+        params = self.DEFAULT_OPTIONS.copy()
+        params.update(custom_options)
+        params['token'] = self.api_token
+        params['url'] = url
+        
+        # Construct query URL
+        query = f"{self.BASE_URL}?{urllib.parse.urlencode(params)}"
+        return query, output_path
+        
+    def _begin_capture(self, url: str, custom_options: Optional[Dict] = None) -> Optional[str]:
         """
-        Generate filename using format: platform_channelid_pagetype_timestamp.png
+        Validate the URL and look for a reusable screenshot before any API call.
         
         Args:
-            url: Target URL
+            url: Target URL to capture
+            custom_options: Optional custom API parameters
             
         Returns:
-            str: Generated filename
+            Optional[str]: Path to a cached screenshot, or None if the API must be called
+            
+        Raises:
+            URLError: If URL is invalid
         """
-        # Extract platform and channel info
-        platform, channel_id = self._extract_platform_info(url)
+        # Validate URL
+        if not self.validate_url(url):
+            raise URLError(f"Invalid URL format or unsupported platform: {url}")
+            
+        if cached_path := self._cached_capture(url, custom_options):
+            logger.info("Reusing recent screenshot: %s", cached_path)
+        return cached_path
         
-        # Detect page type
-        page_type = self._detect_page_type(url, platform)
+    @staticmethod
+    def _check_response(response: httpx.Response):
+        """
+        Raise for an unsuccessful API response.
+        Anything but a 2xx is rejected, so an unfollowed redirect body is never
+        saved as a screenshot.
+        Not raise_for_status(): its message includes the query URL and token.
+        """
+        if response.status_code == 429:
+            raise RateLimitError("API rate limit exceeded (HTTP 429)")
+        if not response.is_success:
+            raise APIError(f"API request failed with HTTP {response.status_code}")
+            
+    @staticmethod
+    def _finish_capture(part_path: str, output_path: str) -> str:
+        """
+        Move a completed download into place and verify it.
+        Downloads go to a temporary name so a failed capture never leaves a partial PNG.
         
-        # Generate timestamp
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        Returns:
+            str: Path to saved screenshot file
+        """
+        os.replace(part_path, output_path)
         
-        # Sanitize components
-        channel_id = self._sanitize_filename(channel_id)
+        # Verify file was created and has size > 0
+        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            logger.info("Screenshot saved to: %s", output_path)
+            return output_path
+        raise APIError("Screenshot file is empty or not created")
         
-        # Combine components
-        filename = f"{platform}_{channel_id}_{page_type}_{timestamp}.png"
+    @staticmethod
+    def _discard_part(part_path: str):
+        """Remove a leftover partial download, if any."""
+        try:
+            os.remove(part_path)
+        except FileNotFoundError:
+            pass
+            
+    def _attempt_failed(self, error: Exception, attempt: int, retries: int, retry_delay: float) -> float:
+        """
+        Handle a failed capture attempt.
         
-        return filename
+        Returns:
+            float: Seconds to wait before the next attempt
+            
+        Raises:
+            APIError: If this was the last attempt
+        """
+        if attempt < retries - 1:
+            logger.warning("Attempt %d failed: %s. Retrying...", attempt + 1, error)
+            return self._retry_wait(error, attempt, retry_delay) if retry_delay else 0
+        raise APIError(f"Failed to capture screenshot after {retries} attempts: {str(error)}")
         
     def capture(self, url: str, custom_options: Optional[Dict] = None, retries: int = 3, retry_delay: int = 5) -> str:
         """
@@ -235,49 +454,76 @@ class ScreenshotAPI:
             URLError: If URL is invalid
             APIError: If screenshot capture fails
         """
-        # Validate URL
-        if not self.validate_url(url):
-            raise URLError(f"Invalid URL format or unsupported platform: {url}")
+        if cached_path := self._begin_capture(url, custom_options):
+            return cached_path
             
+        query, output_path = self._prepare_capture(url, custom_options)
+        part_path = f"{output_path}.part"
+        
         try:
-            # Generate filename
-            filename = self._generate_filename(url)
-            output_path = os.path.join(self.output_dir, filename)
-            
-            # Prepare parameters
-            params = self.DEFAULT_OPTIONS.copy()
-            if custom_options:
-                params.update(custom_options)
-            params['token'] = self.api_token
-            params['url'] = url
+            # Capture screenshot with retry
+            for attempt in range(retries):
+                try:
+                    with self.session.stream('GET', query) as response:
+                        self._check_response(response)
+                        with open(part_path, 'wb') as f:
+                            for chunk in response.iter_bytes(self.DOWNLOAD_CHUNK_SIZE):
+                                f.write(chunk)
+                    return self._finish_capture(part_path, output_path)
+                except Exception as e:
+                    time.sleep(self._attempt_failed(e, attempt, retries, retry_delay))
+                        
+        except Exception as e:
+            logger.error("Failed to capture screenshot for %s: %s", url, e)
+            raise
+        finally:
+            # A failed or cancelled capture leaves no partial download behind
+            self._discard_part(part_path)
+
+    async def capture_async(self, client, url: str, custom_options: Optional[Dict] = None,
+                            retries: int = 3, retry_delay: int = 5) -> str:
+        """
+        Asynchronous version of capture that downloads through a shared HTTP client.
+        
+        Args:
+            client: httpx.AsyncClient shared by all captures, so connections are reused
+            url: Target URL to capture
+            custom_options: Optional custom API parameters
+            retries: Number of retry attempts
+            retry_delay: Delay between retries in seconds
+
+        Returns:
+            str: Path to saved screenshot file
             
-            # Construct query URL
-            query = f"{self.BASE_URL}?{urllib.parse.urlencode(params)}"
+        Raises:
+            URLError: If URL is invalid
+            APIError: If screenshot capture fails
+        """
+        if cached_path := self._begin_capture(url, custom_options):
+            return cached_path
             
+        query, output_path = self._prepare_capture(url, custom_options)
+        part_path = f"{output_path}.part"
+        
+        try:
             # Capture screenshot with retry
             for attempt in range(retries):
                 try:
-                    urllib.request.urlretrieve(query, output_path)
-                    
-                    # Verify file was created and has size > 0
-                    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-                        logger.info(f"Screenshot saved to: {output_path}")
-                        return output_path
-                    else:
-                        raise APIError("Screenshot file is empty or not created")
-                        
+                    async with client.stream('GET', query) as response:
+                        self._check_response(response)
+                        with open(part_path, 'wb') as f:
+                            async for chunk in response.aiter_bytes(self.DOWNLOAD_CHUNK_SIZE):
+                                f.write(chunk)
+                    return self._finish_capture(part_path, output_path)
                 except Exception as e:
-                    if attempt < retries - 1:
-                        logger.warning(f"Attempt {attempt + 1} failed: {str(e)}. Retrying...")
-                        if retry_delay:
-                            import time
-                            time.sleep(retry_delay)
-                    else:
-                        raise APIError(f"Failed to capture screenshot after {retries} attempts: {str(e)}")
+                    await asyncio.sleep(self._attempt_failed(e, attempt, retries, retry_delay))
                         
         except Exception as e:
-            logger.error(f"Failed to capture screenshot for {url}: {str(e)}")
+            logger.error("Failed to capture screenshot for %s: %s", url, e)
             raise
+        finally:
+            # A failed or cancelled capture leaves no partial download behind
+            self._discard_part(part_path)
 
 def main():
     """Main function to handle command line arguments."""
@@ -308,6 +554,8 @@ Examples:
     parser.add_argument('--url', required=True, help='URL to capture')
     parser.add_argument('--output-dir', default='screenshots', 
                        help='Output directory for screenshots (default: screenshots)')
+    parser.add_argument('--cache-ttl', type=float, default=0,
+                       help='Reuse a screenshot of the same page taken within this many seconds (default: 0, disabled)')
     args = parser.parse_args()
     
     # Get API token from environment
@@ -318,8 +566,8 @@ Examples:
         
     try:
         # Initialize API and capture screenshot
-        api = ScreenshotAPI(api_token, args.output_dir)
-        api.capture(args.url)
+        with ScreenshotAPI(api_token, args.output_dir, args.cache_ttl) as api:
+            api.capture(args.url)
         return 0
         
     except Exception as e: